@@ -222,6 +222,16 @@ def register():
     )
     bpy.app.handlers.load_post.append(create_or_update_linked_template_lib)
 
+    from .name_resolver import resubscribe_renames, subscribe_renames
+
+    subscribe_renames()
+    bpy.app.handlers.load_post.append(resubscribe_renames)
+
+    from . import live_materialize, profiling
+
+    live_materialize.register()
+    profiling.register()
+
     registered = True
     return None
 
@@ -245,6 +255,22 @@ def unregister():
     except:
         pass
 
+    try:
+        from . import live_materialize, profiling
+
+        live_materialize.unregister()
+        profiling.unregister()
+    except:
+        pass
+
+    try:
+        from .name_resolver import resubscribe_renames, unsubscribe_renames
+
+        bpy.app.handlers.load_post.remove(resubscribe_renames)
+        unsubscribe_renames()
+    except:
+        pass
+
     try:
         from .materialize_operations import remove_modifier_panel
 
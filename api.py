@@ -0,0 +1,160 @@
+"""Materialize without the user interface.
+
+For scripts and background jobs (blender -b). Roots, the collection to link
+into and the options are passed explicitly instead of being read from the
+context, and results are returned as JSON-serializable dicts instead of
+being reported through an operator:
+
+    from materialize_nodes import api
+
+    result = api.materialize_roots(api.find_roots(bpy.context.scene))
+    if result["status"] == "ERROR":
+        for error in result["errors"]:
+            print("/".join(error["path"]), error["message"])
+
+The module name depends on how the add-on is installed, e.g.
+bl_ext.user_default.materialize_nodes for extensions.
+"""
+
+import bpy
+from . import materialize_operations
+from .profiling import Profiler, write_trace
+from .utils import is_materialize_root
+from .vertex_group_operations import default_weight_levels
+
+
+def find_roots(scene):
+    """Every materialize root in scene"""
+    return [obj for obj in scene.objects if is_materialize_root(obj)]
+
+
+def get_stats(result):
+    """The statistics of the result of one root"""
+    timer = result.get("timings")
+    stats = {
+        "objects": result.get("objects", 0),
+        "timings": {} if timer is None else dict(timer.stages),
+    }
+    if isinstance(timer, Profiler):
+        stats["elements"] = dict(timer.element_counts)
+        stats["bytes_copied"] = dict(timer.bytes_copied)
+        stats["peak_memory"] = timer.peak_memory
+    return stats
+
+
+def find_layer_collection(layer_collection, collection):
+    stack = [layer_collection]
+    while len(stack) > 0:
+        layer_collection = stack.pop()
+        if layer_collection.collection == collection:
+            return layer_collection
+        stack.extend(layer_collection.children)
+    return None
+
+
+def prepare_collection(collection, context):
+    """Links collection into the scene of context if it is not in its view
+    layer yet. Returns an error message if it is excluded from the view
+    layer, armatures in it could not be edited."""
+    view_layer = context.view_layer
+    layer_collection = find_layer_collection(view_layer.layer_collection, collection)
+    if layer_collection is None:
+        context.scene.collection.children.link(collection)
+        layer_collection = find_layer_collection(
+            view_layer.layer_collection, collection
+        )
+    if layer_collection is None or layer_collection.exclude:
+        return f"Collection {collection.name} is excluded from {view_layer.name}"
+    return None
+
+
+def get_root_result(result):
+    return {
+        "status": result["status"],
+        "message": result.get("message", ""),
+        "errors": result.get("errors", []),
+        "stats": get_stats(result),
+    }
+
+
+def materialize_roots(
+    roots,
+    collection=None,
+    *,
+    profile=False,
+    trace_path=None,
+    weight_levels=default_weight_levels,
+    context=None,
+):
+    """Materializes roots, a list of materialize root objects, in one run.
+
+    collection is the collection materialized objects are linked into. By
+    default each root gets a collection of its own, linked into the active
+    collection of context when it is first created. A given collection is
+    linked into the scene if it is not in the view layer yet, and must not be
+    excluded from it. It is remembered on every root: later runs, including
+    those without a collection, keep linking into it. context defaults to
+    bpy.context and supplies the depsgraph and the view layer.
+
+    profile collects element counts, bytes copied and peak memory on top of
+    the stage timings; trace_path, if given with profile, is the Chrome trace
+    event file the spans are written to.
+
+    Vertex group weights are written with one VertexGroup.add call per
+    distinct weight. Groups with more distinct weights than weight_levels are
+    rounded to as many levels, by default 1024, which keeps the error below
+    0.0005 and the calls per group bounded. weight_levels=None writes exact
+    weights, at up to one call per weighted vertex.
+
+    Returns a dict with:
+        status: "OK", or "ERROR" if any root failed
+        message: a summary of the failures
+        errors: the errors of every root, each with status, message and path
+        roots: root name -> status, message, errors and stats of that root
+        stats: timings of the whole run and the number of objects
+    A root that fails, even by raising, does not stop the others. Roots that
+    succeed are marked as materialized, which live materialize requires."""
+    if context is None:
+        context = bpy.context
+    if collection is not None:
+        message = prepare_collection(collection, context)
+        if message is not None:
+            error = {"status": "ERROR", "message": message, "path": []}
+            return {
+                **error,
+                "errors": [error],
+                "roots": {},
+                "stats": {"objects": 0, "timings": {}},
+            }
+    result = materialize_operations.materialize_roots(
+        roots,
+        context,
+        profile=profile,
+        collection=collection,
+        weight_levels=weight_levels,
+    )
+    results = result["results"]
+    if profile:
+        profilers = [root_result["timings"] for root_result in results.values()]
+        for profiler in profilers:
+            profiler.finish()
+        if trace_path:
+            write_trace(trace_path, profilers)
+    root_results = {name: get_root_result(value) for name, value in results.items()}
+    object_count = sum(value["stats"]["objects"] for value in root_results.values())
+    return {
+        "status": result["status"],
+        "message": result.get("message", ""),
+        "errors": result.get("errors", []),
+        "roots": root_results,
+        "stats": {
+            "objects": object_count,
+            "timings": dict(result["timings"].stages),
+        },
+    }
+
+
+def materialize(root, collection=None, **options):
+    """Materializes a single root, see materialize_roots for the options and
+    the result"""
+    return materialize_roots([root], collection, **options)
@@ -0,0 +1,113 @@
+import bpy
+import numpy as np
+
+
+class BoneArrays:
+    """The bones of a parsed armature, flattened parent-first into arrays"""
+
+    def __init__(self, names, heads, tails, rolls, parents):
+        self.names = names
+        self.heads = heads
+        self.tails = tails
+        self.rolls = rolls
+        self.parents = parents
+
+    def __len__(self):
+        return len(self.names)
+
+
+def get_root_bones(armature):
+    bones = list(armature.children or ())
+    if armature.bone is not None:
+        bones.append(armature.bone)
+    return bones
+
+
+def flatten_bones(armature):
+    """Walks the parsed bone hierarchy and collects head, tail, roll and
+    parent index arrays. Bones nested in another bone's CHILDREN are parented
+    to it."""
+    names = []
+    heads = []
+    tails = []
+    rolls = []
+    parents = []
+    stack = [(bone, -1) for bone in reversed(get_root_bones(armature))]
+    while len(stack) > 0:
+        bone, parent_index = stack.pop()
+        index = len(names)
+        names.append(bone.name or "Bone")
+        attributes = bone.attributes
+        head = attributes.get("head", (0.0, 0.0, 0.0))
+        heads.append(head)
+        tails.append(attributes.get("tail", (head[0], head[1], head[2] + 1.0)))
+        rolls.append(attributes.get("roll", 0.0))
+        parents.append(parent_index)
+        for child in reversed(bone.children or ()):
+            stack.append((child, index))
+    return BoneArrays(
+        names,
+        np.array(heads, dtype=np.float32).reshape(-1, 3),
+        np.array(tails, dtype=np.float32).reshape(-1, 3),
+        np.array(rolls, dtype=np.float32),
+        np.array(parents, dtype=np.int32),
+    )
+
+
+def set_edit_bones(armature, bones):
+    edit_bones = armature.edit_bones
+    for edit_bone in reversed(list(edit_bones)):
+        edit_bones.remove(edit_bone)
+    new_bone = edit_bones.new
+    created = [new_bone(name) for name in bones.names]
+    if len(created) == 0:
+        return
+    edit_bones.foreach_set("head", bones.heads.ravel())
+    edit_bones.foreach_set("tail", bones.tails.ravel())
+    edit_bones.foreach_set("roll", bones.rolls)
+    for index in np.flatnonzero(bones.parents >= 0).tolist():
+        created[index].parent = created[bones.parents[index]]
+
+
+def build_armatures(context, armatures):
+    """Builds the bones of every armature in a single edit mode session.
+
+    armatures is a list of (object, BoneArrays). Edit mode can only be entered
+    on objects that are visible in the view layer, the others are skipped and
+    returned. The mode, active object and selection are restored afterwards."""
+    if len(armatures) == 0:
+        return []
+    view_layer = context.view_layer
+    editable = []
+    skipped = []
+    for obj, bones in armatures:
+        if obj.name in view_layer.objects and obj.visible_get(view_layer=view_layer):
+            editable.append((obj, bones))
+        else:
+            skipped.append(obj)
+    if len(editable) == 0:
+        return skipped
+    previous_active = view_layer.objects.active
+    previous_mode = "OBJECT" if previous_active is None else previous_active.mode
+    previous_selection = list(context.selected_objects)
+    if context.mode != "OBJECT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+    for obj in previous_selection:
+        obj.select_set(False)
+    for obj, _ in editable:
+        obj.select_set(True)
+    view_layer.objects.active = editable[0][0]
+    bpy.ops.object.mode_set(mode="EDIT")
+    try:
+        for obj, bones in editable:
+            set_edit_bones(obj.data, bones)
+    finally:
+        bpy.ops.object.mode_set(mode="OBJECT")
+        for obj, _ in editable:
+            obj.select_set(False)
+        for obj in previous_selection:
+            obj.select_set(True)
+        view_layer.objects.active = previous_active
+        if previous_mode != "OBJECT":
+            bpy.ops.object.mode_set(mode=previous_mode)
+    return skipped
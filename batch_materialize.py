@@ -0,0 +1,190 @@
+"""Materializes .blend files in background Blender instances.
+
+Run with any Python 3, outside Blender:
+
+    python batch_materialize.py scenes/*.blend --output summary.json
+    python batch_materialize.py a.blend b.blend --blender /opt/blender/blender --save
+
+Every file is opened in its own `blender -b` process, at most --jobs at a
+time (one per core by default), and every materialize root in it, or only the
+roots named with --roots, is (re)materialized through the api module. The
+results of all files are aggregated into one JSON summary. With --save the
+files are saved afterwards; files with errors are left untouched.
+
+--collection links the materialized objects into the named collection,
+which is created and linked into the scene if needed. The roots remember it,
+so with --save later runs, from the UI too, keep linking into it.
+
+The add-on is used from the Blender preferences if it is enabled there,
+otherwise it is loaded from the directory this script is in.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+addon_dir = os.path.dirname(os.path.abspath(__file__))
+addon_id = "materialize_nodes"
+
+
+def import_addon():
+    """The add-on package, inside Blender"""
+    import bpy
+    import importlib
+    import importlib.util
+
+    for name in bpy.context.preferences.addons.keys():
+        if name.split(".")[-1] == addon_id:
+            return importlib.import_module(name)
+    spec = importlib.util.spec_from_file_location(
+        addon_id,
+        os.path.join(addon_dir, "__init__.py"),
+        submodule_search_locations=[addon_dir],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[addon_id] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_worker(options):
+    """Materializes the open file and writes the result to options.result"""
+    import bpy
+    import importlib
+
+    addon = import_addon()
+    api = importlib.import_module(f"{addon.__name__}.api")
+    scene = bpy.context.scene
+    roots = api.find_roots(scene)
+    if options.roots:
+        roots = [root for root in roots if root.name in options.roots]
+    collection = None
+    if options.collection:
+        # Linked into the scene by the api if it is not already
+        collection = bpy.data.collections.get(options.collection)
+        if collection is None:
+            collection = bpy.data.collections.new(options.collection)
+    result = api.materialize_roots(roots, collection, profile=options.profile)
+    if options.save and result["status"] == "OK":
+        bpy.ops.wm.save_mainfile()
+    with open(options.result, "w") as f:
+        json.dump(result, f)
+
+
+def run_job(path, options):
+    """Runs one file in a background Blender and returns its entry of the
+    summary"""
+    handle, result_path = tempfile.mkstemp(suffix=".json")
+    os.close(handle)
+    command = [
+        options.blender,
+        "--background",
+        path,
+        "--python-exit-code",
+        "1",
+        "--python",
+        os.path.abspath(__file__),
+        "--",
+        "--worker",
+        "--result",
+        result_path,
+    ]
+    if options.roots:
+        command += ["--roots", *options.roots]
+    if options.collection:
+        command += ["--collection", options.collection]
+    if options.profile:
+        command.append("--profile")
+    if options.save:
+        command.append("--save")
+    start = time.perf_counter()
+    entry = {"file": path}
+    try:
+        process = subprocess.run(
+            command, capture_output=True, text=True, timeout=options.timeout
+        )
+        entry["returncode"] = process.returncode
+        with open(result_path) as f:
+            content = f.read()
+        if len(content) > 0:
+            entry.update(json.loads(content))
+        else:
+            entry["status"] = "ERROR"
+            entry["message"] = "Blender exited without a result"
+            entry["log"] = process.stderr[-4000:] or process.stdout[-4000:]
+    except subprocess.TimeoutExpired:
+        entry["status"] = "ERROR"
+        entry["message"] = f"Timed out after {options.timeout}s"
+    finally:
+        os.remove(result_path)
+    entry["seconds"] = time.perf_counter() - start
+    return entry
+
+
+def run_jobs(options):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=options.jobs) as pool:
+        # Each thread only waits on its Blender process
+        entries = list(pool.map(lambda path: run_job(path, options), options.files))
+    failed = [entry["file"] for entry in entries if entry.get("status") != "OK"]
+    return {
+        "status": "OK" if len(failed) == 0 else "ERROR",
+        "files": len(entries),
+        "failed": failed,
+        "objects": sum(
+            entry.get("stats", {}).get("objects", 0) for entry in entries
+        ),
+        "results": entries,
+    }
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help=".blend files to materialize")
+    parser.add_argument("--blender", default="blender", help="Blender executable")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Blender instances to run at once",
+    )
+    parser.add_argument("--roots", nargs="*", help="Only these roots")
+    parser.add_argument(
+        "--collection",
+        help=(
+            "Link materialized objects into this collection, which the roots"
+            " keep using in later runs"
+        ),
+    )
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--save", action="store_true", help="Save materialized files")
+    parser.add_argument("--timeout", type=float, help="Seconds allowed per file")
+    parser.add_argument("--output", help="Write the summary to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    # Inside Blender the script's arguments come after "--"
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    options = parse_arguments(argv)
+    if options.worker:
+        run_worker(options)
+        return
+    summary = run_jobs(options)
+    text = json.dumps(summary, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    sys.exit(0 if summary["status"] == "OK" else 1)
+
+
+if __name__ == "__main__":
+    main()
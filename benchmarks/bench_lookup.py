@@ -0,0 +1,127 @@
+"""Headless benchmark of looking up previously materialized objects.
+
+Run from the add-on directory with numpy and mathutils installed:
+
+    python -m benchmarks.bench_lookup
+    python -m benchmarks.bench_lookup --objects 1000 10000 100000 --depth 4
+
+Builds a root with --objects materialized descendants in parent chains of
+--depth and looks every one of them up by name, as a rematerialization does:
+once through the index materialize builds per run, and once by scanning the
+root's children per object, as materialize used to. Per-object time stays flat
+for the index and grows with the hierarchy for the scan. The scan only sees
+direct children, so it runs on a flat hierarchy, and is skipped above
+--scan-max objects.
+"""
+
+import argparse
+import json
+import time
+from .fake_geometry import Object
+from .headless import load_addon_module
+
+materialized_index = load_addon_module("materialized_index")
+
+
+def build_hierarchy(objects, depth):
+    root = Object("root")
+    parent = root
+    for index in range(objects):
+        if index % depth == 0:
+            parent = root
+        parent = Object(f"Object.{index}", parent=parent)
+        parent["materialize"] = "CHILD"
+        parent["materialize_name"] = parent.name
+    return root
+
+
+def find_in_children(root_obj, name):
+    """The lookup materialize did before the index, for comparison"""
+    for child in root_obj.children:
+        if "materialize_name" not in child:
+            continue
+        if child["materialize_name"] == name:
+            return child
+    return None
+
+
+def lookup_indexed(root, names):
+    index = materialized_index.build_materialized_index(root)
+    return sum(1 for name in names if index.get(name) is not None)
+
+
+def lookup_scanned(root, names):
+    return sum(1 for name in names if find_in_children(root, name) is not None)
+
+
+def measure(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = function()
+        best = min(best, time.perf_counter() - start)
+    return best, found
+
+
+def run(options):
+    rows = []
+    for objects in options.objects:
+        names = [f"Object.{index}" for index in range(objects)]
+        root = build_hierarchy(objects, options.depth)
+        seconds, found = measure(lambda: lookup_indexed(root, names), options.repeat)
+        row = {
+            "case": f"objects-{objects}",
+            "objects": objects,
+            "found": found,
+            "index_seconds": seconds,
+        }
+        if objects <= options.scan_max:
+            flat = build_hierarchy(objects, 1)
+            seconds, _ = measure(lambda: lookup_scanned(flat, names), 1)
+            row["scan_seconds"] = seconds
+        rows.append(row)
+    return rows
+
+
+def format_rows(rows):
+    lines = [
+        f"{'case':<18}{'found':>10}{'index ms':>12}{'us/obj':>10}"
+        f"{'scan ms':>12}{'us/obj':>10}"
+    ]
+    for row in rows:
+        objects = max(row["objects"], 1)
+        scan = row.get("scan_seconds")
+        lines.append(
+            f"{row['case']:<18}{row['found']:>10}"
+            f"{row['index_seconds'] * 1000:>12.2f}"
+            f"{row['index_seconds'] * 1e6 / objects:>10.3f}"
+            f"{'' if scan is None else f'{scan * 1000:.2f}':>12}"
+            f"{'' if scan is None else f'{scan * 1e6 / objects:.3f}':>10}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--objects", type=int, nargs="+", default=[100, 1000, 10000, 100000]
+    )
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scan-max",
+        type=int,
+        default=10000,
+        help="Largest hierarchy the quadratic scan is run on",
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    options = parser.parse_args()
+    rows = run(options)
+    print(format_rows(rows))
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
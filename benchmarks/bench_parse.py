@@ -0,0 +1,171 @@
+"""Headless parse benchmarks.
+
+Run from the add-on directory with numpy and mathutils installed:
+
+    python -m benchmarks.bench_parse
+    python -m benchmarks.bench_parse --objects 100 1000 10000 --json results.json
+
+Reports parse time (best of --repeat runs) and the peak memory traced while
+parsing, for synthetic hierarchies of increasing size and for deep bone chains.
+The stream column is the peak when records are consumed one at a time, the
+checked column the time to validate and then stream, sharing the id columns
+the way materialize does.
+"""
+
+import argparse
+import collections
+import gc
+import json
+import time
+import tracemalloc
+from .generate import generate_bone_chain, generate_hierarchy
+from .headless import load_addon_module
+
+parsing = load_addon_module("parsing")
+content_hash = load_addon_module("content_hash")
+validation = load_addon_module("validation")
+
+
+def consume(result):
+    return list(result)
+
+
+def measure(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def bench_parse(root, repeat):
+    return measure(lambda: consume(parsing.parse_objects(root)), repeat)
+
+
+def bench_stream(root, repeat):
+    """Parses one object at a time without keeping the records, as
+    materialize does"""
+    return measure(
+        lambda: collections.deque(parsing.iter_objects(root), maxlen=0), repeat
+    )
+
+
+def bench_checked(root, repeat):
+    def run():
+        id_tables = validation.IdTables()
+        validation.validate_geometry(root, id_tables=id_tables)
+        collections.deque(parsing.iter_objects(root, id_tables=id_tables), maxlen=0)
+
+    return measure(run, repeat)
+
+
+def bench_hash(root, repeat):
+    objects = consume(parsing.parse_objects(root))
+    return measure(
+        lambda: [content_hash.hash_object_data(o) for o in objects], repeat
+    )
+
+
+def run(options):
+    rows = []
+    for objects in options.objects:
+        root, element_count = generate_hierarchy(
+            objects=objects,
+            depth=options.depth,
+            bones=options.bones,
+            vertex_groups=options.vertex_groups,
+            constraints=options.constraints,
+            selection_size=options.selection_size,
+            vertices=options.vertices,
+            extra_columns=options.extra_columns,
+        )
+        parse_time, parse_peak = bench_parse(root, options.repeat)
+        stream_time, stream_peak = bench_stream(root, options.repeat)
+        checked_time, checked_peak = bench_checked(root, options.repeat)
+        hash_time, hash_peak = bench_hash(root, options.repeat)
+        rows.append(
+            {
+                "case": f"hierarchy-{objects}",
+                "elements": element_count,
+                "parse_seconds": parse_time,
+                "parse_peak_bytes": parse_peak,
+                "stream_seconds": stream_time,
+                "stream_peak_bytes": stream_peak,
+                "checked_seconds": checked_time,
+                "checked_peak_bytes": checked_peak,
+                "hash_seconds": hash_time,
+                "hash_peak_bytes": hash_peak,
+            }
+        )
+    for length in options.chain_lengths:
+        root, element_count = generate_bone_chain(length)
+        parse_time, parse_peak = bench_parse(root, options.repeat)
+        rows.append(
+            {
+                "case": f"bone-chain-{length}",
+                "elements": element_count,
+                "parse_seconds": parse_time,
+                "parse_peak_bytes": parse_peak,
+            }
+        )
+    return rows
+
+
+def format_rows(rows):
+    lines = [
+        f"{'case':<22}{'elements':>10}{'parse ms':>12}{'peak KiB':>12}"
+        f"{'us/elem':>10}{'stream KiB':>12}{'checked ms':>12}{'hash ms':>10}"
+    ]
+    for row in rows:
+        stream_peak = row.get("stream_peak_bytes")
+        checked = row.get("checked_seconds")
+        hash_ms = row.get("hash_seconds")
+        lines.append(
+            f"{row['case']:<22}{row['elements']:>10}"
+            f"{row['parse_seconds'] * 1000:>12.2f}"
+            f"{row['parse_peak_bytes'] / 1024:>12.1f}"
+            f"{row['parse_seconds'] * 1e6 / max(row['elements'], 1):>10.2f}"
+            f"{'' if stream_peak is None else f'{stream_peak / 1024:.1f}':>12}"
+            f"{'' if checked is None else f'{checked * 1000:.2f}':>12}"
+            f"{'' if hash_ms is None else f'{hash_ms * 1000:.2f}':>10}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--bones", type=int, default=8)
+    parser.add_argument("--vertex-groups", type=int, default=4)
+    parser.add_argument("--constraints", type=int, default=2)
+    parser.add_argument("--selection-size", type=int, default=16)
+    parser.add_argument("--vertices", type=int, default=64)
+    parser.add_argument(
+        "--extra-columns",
+        type=int,
+        default=0,
+        help="Unused float attributes added to every instance table",
+    )
+    parser.add_argument(
+        "--chain-lengths", type=int, nargs="*", default=[100, 1000, 10000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this file")
+    options = parser.parse_args()
+    rows = run(options)
+    print(format_rows(rows))
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Headless vertex group assignment benchmark.
+
+Run from the add-on directory with numpy and mathutils installed:
+
+    python -m benchmarks.bench_vertex_groups
+    python -m benchmarks.bench_vertex_groups --vertices 1000000 --groups 100
+
+Each group has a float weight attribute on the mesh with --density of its
+vertices weighted and the rest zero. Reports the time to assign all groups
+and the number of VertexGroup.add calls it took, with weights rounded to
+--weight-levels levels as materialize does by default, or with --exact
+weights.
+
+The rematerialize case then writes a mesh with new weights over the first one
+in place, as rematerializing does, and counts the groups whose weights do not
+match the new attributes. Vertex groups and attributes share names, so the
+old groups have to be gone before the write.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from .fake_geometry import Mesh, Object
+from .headless import load_addon_module
+
+data_block_pool = load_addon_module("data_block_pool")
+parsing = load_addon_module("parsing")
+vertex_group_operations = load_addon_module("vertex_group_operations")
+
+
+def build_mesh(vertices, groups, density, seed=0):
+    random = np.random.default_rng(seed)
+    mesh = Mesh("weights", np.zeros((vertices, 3), np.float32))
+    records = []
+    vertex_group_type_id = parsing.element_decoders_by_name["VERTEX_GROUP"].type_id
+    for group in range(groups):
+        name = f"Group.{group:03d}"
+        weights = random.random(vertices, dtype=np.float32)
+        weights[random.random(vertices) >= density] = 0.0
+        mesh.attributes.new(name, weights)
+        record = parsing.VertexGroupRecord(vertex_group_type_id)
+        record.name = name
+        records.append(record)
+    return mesh, records
+
+
+def count_mismatched(obj, source, weight_levels):
+    """Groups missing from obj or whose weights differ from the attributes of
+    source by more than the rounding allows"""
+    tolerance = 0.0 if weight_levels is None else 0.5 / weight_levels
+    groups = {group.name: group for group in obj.vertex_groups}
+    mismatched = 0
+    for name, attribute in source.attributes.items():
+        if name == "position":
+            continue
+        group = groups.get(name)
+        if group is None or np.abs(group.weights - attribute.array).max() > tolerance:
+            mismatched += 1
+    return mismatched
+
+
+def measure(case, obj, assign):
+    start = time.perf_counter()
+    assign()
+    seconds = time.perf_counter() - start
+    return {
+        "case": case,
+        "groups": len(obj.vertex_groups),
+        "weighted": sum(int(np.count_nonzero(g.weights)) for g in obj.vertex_groups),
+        "add_calls": sum(g.add_calls for g in obj.vertex_groups),
+        "seconds": seconds,
+    }
+
+
+def rematerialize(obj, source, records, weight_levels):
+    """What update_data_block does for a mesh with the same element counts"""
+    obj.vertex_groups.clear()
+    if not data_block_pool.write_in_place("MESH", obj.data, source):
+        raise RuntimeError("The mesh was not written in place")
+    vertex_group_operations.assign_vertex_groups(
+        obj, obj.data, records, weight_levels
+    )
+
+
+def run(options):
+    rows = []
+    levels = None if options.exact else options.weight_levels
+    for vertices in options.vertices:
+        mesh, records = build_mesh(vertices, options.groups, options.density)
+        # Kept to compare against, assigning removes the weight attributes
+        first = mesh.copy()
+        obj = Object("Object", mesh)
+        row = measure(
+            f"vertices-{vertices}",
+            obj,
+            lambda: vertex_group_operations.assign_vertex_groups(
+                obj, mesh, records, levels
+            ),
+        )
+        row["mismatched"] = count_mismatched(obj, first, levels)
+        rows.append(row)
+        source, records = build_mesh(vertices, options.groups, options.density, 1)
+        row = measure(
+            f"rematerialize-{vertices}",
+            obj,
+            lambda: rematerialize(obj, source, records, levels),
+        )
+        row["mismatched"] = count_mismatched(obj, source, levels)
+        rows.append(row)
+    return rows
+
+
+def format_rows(rows):
+    lines = [
+        f"{'case':<24}{'groups':>8}{'weighted':>12}{'add calls':>12}"
+        f"{'mismatched':>12}{'ms':>10}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['case']:<24}{row['groups']:>8}{row['weighted']:>12}"
+            f"{row['add_calls']:>12}{row['mismatched']:>12}"
+            f"{row['seconds'] * 1000:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vertices", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--density", type=float, default=0.1)
+    parser.add_argument(
+        "--weight-levels",
+        type=int,
+        default=vertex_group_operations.default_weight_levels,
+        help="Round weights to this many levels",
+    )
+    parser.add_argument(
+        "--exact", action="store_true", help="Write the weights without rounding"
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    options = parser.parse_args()
+    rows = run(options)
+    print(format_rows(rows))
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Pure-Python stand-ins for the parts of the Blender API the parser touches.
+
+Only the surface used by parsing, content hashing and vertex group
+assignment is modelled: geometry sets with instances_pointcloud()/
+instance_references(), attribute groups, attribute data with per-element
+access and foreach_get/foreach_set, meshes, and objects with vertex groups,
+children and ID properties. Attribute names are unique across the attributes
+and vertex groups of a mesh, as in Blender. Class names mirror the bpy types
+so type-name based dispatch behaves the same."""
+
+import mathutils
+import numpy as np
+
+# (data type, foreach_get property) for numpy column dtypes and widths
+column_data_types = {
+    ("f", 1): ("FLOAT", "value"),
+    ("f", 2): ("FLOAT2", "vector"),
+    ("f", 3): ("FLOAT_VECTOR", "vector"),
+    ("f", 4): ("FLOAT_COLOR", "color"),
+    ("f", 16): ("FLOAT4X4", "value"),
+    ("i", 1): ("INT", "value"),
+    ("b", 1): ("BOOLEAN", "value"),
+}
+column_shapes = {
+    data_type: shape for shape, (data_type, _) in column_data_types.items()
+}
+column_dtypes = {"f": np.float32, "i": np.int32, "b": np.bool_}
+
+
+class AttributeValue:
+    __slots__ = ("attribute", "index")
+
+    def __init__(self, attribute, index):
+        self.attribute = attribute
+        self.index = index
+
+    def _read(self):
+        value = self.attribute.array[self.index]
+        if isinstance(value, np.ndarray):
+            return mathutils.Vector(value.tolist())
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    @property
+    def value(self):
+        return self._read()
+
+    @property
+    def vector(self):
+        return self._read()
+
+    @property
+    def color(self):
+        return self._read()
+
+
+class AttributeData:
+    def __init__(self, attribute):
+        self.attribute = attribute
+
+    def __len__(self):
+        return len(self.attribute.array)
+
+    def __getitem__(self, index):
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        return AttributeValue(self.attribute, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield AttributeValue(self.attribute, index)
+
+    def foreach_get(self, key, buffer):
+        if key != self.attribute.key:
+            raise TypeError(f"{self.attribute.data_type} has no property {key}")
+        buffer[:] = np.asarray(self.attribute.array).reshape(-1)
+
+    def foreach_set(self, key, buffer):
+        if key != self.attribute.key:
+            raise TypeError(f"{self.attribute.data_type} has no property {key}")
+        array = self.attribute.array
+        array[...] = np.asarray(buffer).reshape(array.shape)
+
+
+class Attribute:
+    def __init__(self, name, array, domain="POINT"):
+        self.name = name
+        self.domain = domain
+        if isinstance(array, list) and len(array) > 0 and isinstance(array[0], str):
+            self.data_type = "STRING"
+            self.key = "value"
+            self.array = array
+        else:
+            array = np.asarray(array)
+            width = 1 if array.ndim == 1 else array.shape[1]
+            self.data_type, self.key = column_data_types[(array.dtype.kind, width)]
+            self.array = array
+        self.data = AttributeData(self)
+
+
+class AttributeGroup:
+    def __init__(self, attributes=(), owner=None):
+        self._attributes = {attribute.name: attribute for attribute in attributes}
+        self.owner = owner
+
+    def __contains__(self, name):
+        return name in self._attributes
+
+    def __iter__(self):
+        return iter(list(self._attributes.values()))
+
+    def __getitem__(self, name):
+        return self._attributes[name]
+
+    def __len__(self):
+        return len(self._attributes)
+
+    def get(self, name, default=None):
+        return self._attributes.get(name, default)
+
+    def items(self):
+        return list(self._attributes.items())
+
+    def unique_name(self, name):
+        taken = set(self._attributes)
+        taken.update(getattr(self.owner, "vertex_group_names", ()))
+        unique = name
+        number = 0
+        while unique in taken:
+            number += 1
+            unique = f"{name}.{number:03d}"
+        return unique
+
+    def new(self, name, array, domain="POINT"):
+        """array holds the values, or is a data type name as in Blender, which
+        creates a zeroed attribute over the domain of the owner"""
+        if isinstance(array, str):
+            kind, width = column_shapes[array]
+            size = self.owner.get_domain_size(domain)
+            shape = (size,) if width == 1 else (size, width)
+            array = np.zeros(shape, dtype=column_dtypes[kind])
+        name = self.unique_name(name)
+        attribute = Attribute(name, array, domain)
+        self._attributes[name] = attribute
+        return attribute
+
+    def remove(self, attribute):
+        del self._attributes[attribute.name]
+
+
+class ElementCollection:
+    """A mesh element collection such as edges or polygons"""
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def foreach_get(self, key, buffer):
+        buffer[:] = self.columns[key].reshape(-1)
+
+    def foreach_set(self, key, buffer):
+        column = self.columns[key]
+        column[...] = np.asarray(buffer).reshape(column.shape)
+
+
+class Mesh:
+    def __init__(self, name, positions, edges=None, loop_starts=None, loops=None):
+        self.name = name
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        edges = np.zeros((0, 2), dtype=np.int32) if edges is None else edges
+        loop_starts = np.zeros(0, np.int32) if loop_starts is None else loop_starts
+        loops = np.zeros(0, dtype=np.int32) if loops is None else loops
+        self.attributes = AttributeGroup([Attribute("position", positions)], self)
+        self.vertices = ElementCollection({}, len(positions))
+        self.edges = ElementCollection({"vertices": edges}, len(edges))
+        self.polygons = ElementCollection({"loop_start": loop_starts}, len(loop_starts))
+        self.loops = ElementCollection(
+            {"vertex_index": loops, "edge_index": np.zeros_like(loops)}, len(loops)
+        )
+        self.materials = []
+        # Vertex group names live on the mesh in Blender
+        self.vertex_group_names = []
+
+    def get_domain_size(self, domain):
+        collection = {
+            "POINT": self.vertices,
+            "EDGE": self.edges,
+            "CORNER": self.loops,
+            "FACE": self.polygons,
+        }[domain]
+        return len(collection)
+
+    def copy(self):
+        copy = Mesh.__new__(Mesh)
+        copy.__dict__.update(self.__dict__)
+        copy.attributes = AttributeGroup(
+            (
+                Attribute(name, np.array(attribute.array), attribute.domain)
+                for name, attribute in self.attributes.items()
+            ),
+            copy,
+        )
+        copy.vertex_group_names = list(self.vertex_group_names)
+        return copy
+
+    def update(self):
+        pass
+
+
+class VertexGroup:
+    """Keeps the weights densely; add() is the only way to write them, as in
+    Blender, and counts its calls"""
+
+    def __init__(self, name, vertex_count):
+        self.name = name
+        self.weights = np.zeros(vertex_count, dtype=np.float32)
+        self.add_calls = 0
+
+    def add(self, index, weight, type):
+        self.add_calls += 1
+        self.weights[np.asarray(index, dtype=np.int64)] = weight
+
+
+class VertexGroups:
+    def __init__(self, obj):
+        self.obj = obj
+        self.groups = []
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def new(self, name="Group"):
+        mesh = self.obj.data
+        group = VertexGroup(mesh.attributes.unique_name(name), len(mesh.vertices))
+        self.groups.append(group)
+        mesh.vertex_group_names.append(group.name)
+        return group
+
+    def clear(self):
+        self.groups.clear()
+        self.obj.data.vertex_group_names.clear()
+
+
+class Object:
+    def __init__(self, name, data=None, parent=None):
+        self.name = name
+        self.data = data
+        self.vertex_groups = VertexGroups(self)
+        self.properties = {}
+        self.parent = parent
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+    @property
+    def children_recursive(self):
+        result = []
+        stack = list(reversed(self.children))
+        while len(stack) > 0:
+            child = stack.pop()
+            result.append(child)
+            stack.extend(reversed(child.children))
+        return result
+
+    def get(self, key, default=None):
+        return self.properties.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.properties
+
+    def __getitem__(self, key):
+        return self.properties[key]
+
+    def __setitem__(self, key, value):
+        self.properties[key] = value
+
+
+class PointCloud:
+    def __init__(self, attributes):
+        self.attributes = AttributeGroup(attributes)
+
+    def copy(self):
+        return PointCloud(self.attributes._attributes.values())
+
+
+class GeometrySet:
+    def __init__(self, name="", mesh=None, instances=None):
+        self.name = name
+        self.mesh = mesh
+        self.curves = None
+        self.pointcloud = None
+        self.volume = None
+        self.grease_pencil = None
+        # (instances pointcloud, references) or None
+        self.instances = instances
+
+    def instances_pointcloud(self):
+        if self.instances is None:
+            return None
+        return self.instances[0]
+
+    def instance_references(self):
+        if self.instances is None:
+            return None
+        return list(self.instances[1])
@@ -0,0 +1,223 @@
+"""Generates synthetic materialize hierarchies out of fake geometry sets.
+
+The layout follows what the Materialize node groups output: a root whose
+instances are objects, objects whose instances are their NAME, DATA,
+MODIFIERS and CONSTRAINTS elements, and so on down to bones and selections."""
+
+import numpy as np
+from .fake_geometry import Attribute, GeometrySet, Mesh, PointCloud
+from .headless import load_addon_module
+
+parsing = load_addon_module("parsing")
+
+type_id = {name: id for id, name in parsing.type_ids.items()}
+data_block_type_id = {name: id for id, name in parsing.data_block_type_ids.items()}
+modifier_type_id = {name: id for id, name in parsing.modifier_type_ids.items()}
+space_type_id = {name: id for id, name in parsing.space_type_ids.items()}
+
+
+class HierarchyBuilder:
+    def __init__(
+        self,
+        objects=100,
+        depth=4,
+        bones=0,
+        vertex_groups=0,
+        constraints=0,
+        selection_size=0,
+        vertices=8,
+        extra_columns=0,
+        seed=0,
+    ):
+        self.objects = objects
+        self.depth = max(depth, 1)
+        self.bones = bones
+        self.vertex_groups = vertex_groups
+        self.constraints = constraints
+        self.selection_size = selection_size
+        self.vertices = vertices
+        self.extra_columns = extra_columns
+        self.random = np.random.default_rng(seed)
+        self.element_count = 0
+
+    def instances(self, name, elements, columns=None):
+        """A geometry set instancing elements, a list of (type, subtype, geometry)"""
+        self.element_count += len(elements)
+        count = len(elements)
+        attributes = [
+            Attribute("type", np.array([type_id[e[0]] for e in elements], np.int32)),
+            Attribute("subtype", np.array([e[1] for e in elements], np.int32)),
+            Attribute(".reference_index", np.arange(count, dtype=np.int32)),
+        ]
+        for column_name, column in (columns or {}).items():
+            attributes.append(Attribute(column_name, column))
+        # Columns no element type reads, as in instances shared by many types
+        for column in range(self.extra_columns):
+            values = self.random.random(count, dtype=np.float32)
+            attributes.append(Attribute(f"custom.{column:03d}", values))
+        references = [element[2] for element in elements]
+        return GeometrySet(name, instances=(PointCloud(attributes), references))
+
+    def name(self, name):
+        return ("NAME", 0, GeometrySet(name))
+
+    def bag(self, type_name, name, elements, subtype=0, columns=None):
+        return (type_name, subtype, self.instances(name, elements, columns))
+
+    def mesh(self, name, vertex_count):
+        positions = self.random.random((vertex_count, 3), dtype=np.float32)
+        edges = np.stack(
+            [np.arange(vertex_count), np.roll(np.arange(vertex_count), -1)], axis=1
+        ).astype(np.int32)
+        return Mesh(name, positions, edges)
+
+    def selection(self, vertex_count):
+        indices = self.random.choice(
+            vertex_count, size=min(self.selection_size, vertex_count), replace=False
+        ).astype(np.int32)
+        mesh = Mesh("selection", np.zeros((len(indices), 3), np.float32))
+        mesh.attributes.new("index", indices)
+        return ("SELECTION", 0, GeometrySet("selection", mesh=mesh))
+
+    def target(self, object_name, bone_name=""):
+        elements = [self.bag("TARGET_VALUE", "target", [self.name(object_name)])]
+        if len(bone_name) > 0:
+            elements.append(
+                self.bag("SUBTARGET_VALUE", "subtarget", [self.name(bone_name)])
+            )
+        return self.bag("TARGET", "target", elements)
+
+    def space(self, type_name, space):
+        return self.bag(type_name, type_name.lower(), [], space_type_id[space])
+
+    def bone_chain(self, prefix, length):
+        """A chain of bones, each nested in the CHILDREN of the previous one"""
+        bone = None
+        for level in reversed(range(length)):
+            elements = [self.name(f"{prefix}.{level:03d}")]
+            if bone is not None:
+                elements.append(self.bone_children([bone], level + 1))
+            bone = self.instances(f"{prefix}.{level:03d}", elements)
+        return bone
+
+    def bone_children(self, bones, level):
+        count = len(bones)
+        heads = np.zeros((count, 3), np.float32)
+        heads[:, 0] = np.arange(count)
+        heads[:, 2] = level
+        tails = heads.copy()
+        tails[:, 2] += 1.0
+        return self.bag(
+            "CHILDREN",
+            "children",
+            [("BONE", 0, bone) for bone in bones],
+            columns={
+                "head": heads,
+                "tail": tails,
+                "roll": np.zeros(count, np.float32),
+            },
+        )
+
+    def armature(self, index):
+        chains = max(self.bones // self.depth, 1)
+        bones = [self.bone_chain(f"Bone.{index}.{chain}", self.depth) for chain in range(chains)]
+        return self.bag(
+            "GEOMETRY",
+            "armature",
+            [self.bone_children(bones, 0)],
+            data_block_type_id["ARMATURE"],
+        )
+
+    def vertex_group_elements(self, mesh):
+        groups = []
+        for group in range(self.vertex_groups):
+            group_name = f"Group.{group:03d}"
+            weights = self.random.random(len(mesh.attributes["position"].array))
+            mesh.attributes.new(group_name, weights.astype(np.float32))
+            elements = [self.name(group_name)]
+            if self.selection_size > 0:
+                elements.append(self.selection(self.vertices))
+            groups.append(self.bag("VERTEX_GROUP", group_name, elements))
+        return self.bag("VERTEX_GROUPS", "vertex_groups", groups)
+
+    def data(self, index):
+        elements = [self.name(f"Data.{index}")]
+        if self.bones > 0 and index % 2 == 1:
+            elements.append(self.armature(index))
+        else:
+            mesh = self.mesh(f"Mesh.{index}", self.vertices)
+            if self.vertex_groups > 0:
+                elements.append(self.vertex_group_elements(mesh))
+            elements.append(
+                ("GEOMETRY", data_block_type_id["MESH"], GeometrySet("mesh", mesh=mesh))
+            )
+        return self.bag("DATA", "data", elements)
+
+    def modifiers(self, index):
+        elements = [self.name("Hook"), self.target(f"Object.{index}")]
+        if self.selection_size > 0:
+            elements.append(self.selection(self.vertices))
+        hook = self.bag("MODIFIER", "hook", elements, modifier_type_id["HOOK"])
+        return self.bag(
+            "MODIFIERS", "modifiers", [hook], columns={"strength": np.ones(1, np.float32)}
+        )
+
+    def constraint_stack(self, index):
+        count = self.constraints
+        constraints = [
+            self.bag(
+                "CONSTRAINT",
+                f"constraint.{c}",
+                [
+                    self.name(f"Constraint.{c}"),
+                    self.target(f"Object.{index}", "Bone"),
+                    self.space("OWNER_SPACE", "WORLD"),
+                    self.space("TARGET_SPACE", "WORLD"),
+                ],
+                subtype=1 + c % len(parsing.constraint_type_ids),
+            )
+            for c in range(count)
+        ]
+        return self.bag(
+            "CONSTRAINTS",
+            "constraints",
+            constraints,
+            columns={"influence": np.full(count, 0.5, np.float32)},
+        )
+
+    def object(self, index):
+        elements = [self.name(f"Object.{index}"), self.data(index)]
+        elements.append(self.modifiers(index))
+        if self.constraints > 0:
+            elements.append(self.constraint_stack(index))
+        return self.instances(f"Object.{index}", elements)
+
+    def build(self):
+        """Objects form parent chains of length depth via the parent index"""
+        objects = [("OBJECT", 0, self.object(index)) for index in range(self.objects)]
+        indices = np.arange(self.objects, dtype=np.int32)
+        parents = np.where(indices % self.depth == 0, -1, indices - 1).astype(np.int32)
+        locations = self.random.random((self.objects, 3), dtype=np.float32)
+        return self.instances(
+            "root", objects, columns={"parent": parents, "location": locations}
+        )
+
+
+def generate_hierarchy(**options):
+    """Returns (root geometry set, element count)"""
+    builder = HierarchyBuilder(**options)
+    root = builder.build()
+    return root, builder.element_count
+
+
+def generate_bone_chain(length):
+    """A single armature object whose bones nest length levels deep"""
+    builder = HierarchyBuilder(objects=1, depth=length, bones=length)
+    data = builder.bag(
+        "DATA", "data", [builder.name("Data"), builder.armature(0)]
+    )
+    obj = builder.instances("Object", [builder.name("Object"), data])
+    root = builder.instances(
+        "root", [("OBJECT", 0, obj)], columns={"parent": np.full(1, -1, np.int32)}
+    )
+    return root, builder.element_count
@@ -0,0 +1,18 @@
+"""Imports add-on modules without running the add-on's __init__, which needs
+bpy. Only modules that do not import bpy themselves can be loaded this way."""
+
+import importlib
+import os
+import sys
+import types
+
+addon_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+package_name = "materialize_headless"
+
+
+def load_addon_module(name):
+    if package_name not in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [addon_dir]
+        sys.modules[package_name] = package
+    return importlib.import_module(f"{package_name}.{name}")
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import struct
+import mathutils
+import numpy as np
+from types import MappingProxyType
+from .parsing import ElementRecord, GeometryRef, geometry_components, read_attribute_column
+
+# Topology arrays hashed in addition to the attributes of each data-block type,
+# as (collection, foreach_get property, components per element)
+topology_columns = {
+    "Mesh": (
+        ("edges", "vertices", 2),
+        ("polygons", "loop_start", 1),
+        ("loops", "vertex_index", 1),
+    ),
+    "Curves": (("curve_offset_data", "value", 1),),
+    "GreasePencilDrawing": (("curve_offsets", "value", 1),),
+}
+
+math_types = (mathutils.Vector, mathutils.Quaternion, mathutils.Color, mathutils.Euler)
+
+
+def hash_object_data(object_data):
+    """A stable digest of a parsed object, used to skip unchanged objects when
+    rematerializing"""
+    hasher = hashlib.blake2b(digest_size=16)
+    update_hash(hasher, object_data)
+    return hasher.hexdigest()
+
+
+def update_hash(hasher, value):
+    # Parsed bone chains can be thousands of levels deep, so walk iteratively
+    stack = [value]
+    while len(stack) > 0:
+        value = stack.pop()
+        if value is None:
+            hasher.update(b"n")
+        elif isinstance(value, ElementRecord):
+            hasher.update(b"r%d:%r;" % (value.type_id, value.subtype_id))
+            stack.extend(reversed(value.content()))
+        elif isinstance(value, str):
+            encoded = value.encode()
+            hasher.update(b"s%d:" % len(encoded))
+            hasher.update(encoded)
+        elif isinstance(value, bool):
+            hasher.update(b"t" if value else b"f")
+        elif isinstance(value, int):
+            hasher.update(b"i%d;" % value)
+        elif isinstance(value, float):
+            hasher.update(b"d" + struct.pack("<d", value))
+        elif isinstance(value, (dict, MappingProxyType)):
+            hasher.update(b"{%d" % len(value))
+            for key in sorted(value, reverse=True):
+                stack.append(value[key])
+                stack.append(key)
+        elif isinstance(value, (list, tuple)):
+            hasher.update(b"[%d" % len(value))
+            stack.extend(reversed(value))
+        elif isinstance(value, np.ndarray):
+            hash_array(hasher, value)
+        elif isinstance(value, np.generic):
+            stack.append(value.item())
+        elif isinstance(value, math_types):
+            hasher.update(b"v%d" % len(value))
+            hasher.update(struct.pack(f"<{len(value)}d", *value))
+        elif isinstance(value, mathutils.Matrix):
+            hasher.update(b"m")
+            for row in value:
+                hasher.update(struct.pack(f"<{len(row)}d", *row))
+        elif isinstance(value, GeometryRef):
+            hash_geometry(hasher, value)
+        else:
+            stack.append(repr(value))
+
+
+def hash_array(hasher, array):
+    array = np.ascontiguousarray(array)
+    hasher.update(b"a" + array.dtype.str.encode() + repr(array.shape).encode())
+    hasher.update(array.tobytes())
+
+
+def hash_geometry(hasher, geometry_ref):
+    """Hashes the evaluated geometry behind a ref without copying it"""
+    hasher.update(b"g" + geometry_ref.subtype.encode())
+    if geometry_ref.subtype == "INSTANCE":
+        hash_geometry_set(hasher, geometry_ref.component())
+    else:
+        hash_data_block(hasher, geometry_ref.component())
+
+
+def hash_data_block(hasher, data_block):
+    for [collection_name, key, width] in topology_columns.get(
+        type(data_block).__name__, ()
+    ):
+        collection = getattr(data_block, collection_name)
+        column = np.empty(len(collection) * width, dtype=np.int32)
+        collection.foreach_get(key, column)
+        hash_array(hasher, column)
+    attributes = getattr(data_block, "attributes", None)
+    if attributes is not None:
+        for [attribute_name, attribute] in sorted(attributes.items()):
+            update_hash(hasher, (attribute_name, attribute.domain, attribute.data_type))
+            update_hash(hasher, read_attribute_column(attribute))
+    layers = getattr(data_block, "layers", None)
+    if layers is not None:
+        hash_grease_pencil_layers(hasher, layers)
+    if hasattr(data_block, "grids"):
+        # Voxels are not readable from Python, so a volume never hashes the
+        # same twice and is always rebuilt
+        hasher.update(b"x" + os.urandom(16))
+    materials = getattr(data_block, "materials", None)
+    if materials is not None:
+        update_hash(
+            hasher, [None if m is None else m.name for m in materials]
+        )
+
+
+def hash_grease_pencil_layers(hasher, layers):
+    """The strokes are in the drawing of each frame, not in the attributes of
+    the grease pencil itself"""
+    hasher.update(b"l%d" % len(layers))
+    for layer in layers:
+        update_hash(hasher, (layer.name, len(layer.frames)))
+        for frame in layer.frames:
+            update_hash(hasher, frame.frame_number)
+            drawing = frame.drawing
+            if drawing is None:
+                # A reference to another grease pencil, hashed as changed
+                hasher.update(b"x" + os.urandom(16))
+            else:
+                hash_data_block(hasher, drawing)
+
+
+def hash_geometry_set(hasher, geometry):
+    stack = [geometry]
+    while len(stack) > 0:
+        geometry = stack.pop()
+        if not hasattr(geometry, "instances_pointcloud"):
+            # Objects and collections referenced by instances
+            update_hash(hasher, ("ID", type(geometry).__name__, geometry.name))
+            continue
+        for component_name in geometry_components.values():
+            component = getattr(geometry, component_name)
+            if component is not None:
+                hasher.update(component_name.encode())
+                hash_data_block(hasher, component)
+        pointcloud = geometry.instances_pointcloud()
+        references = geometry.instance_references()
+        if pointcloud is None or references is None:
+            hasher.update(b"-")
+            continue
+        hash_data_block(hasher, pointcloud)
+        hasher.update(b"r%d" % len(references))
+        stack.extend(reversed(references))
@@ -0,0 +1,179 @@
+import numpy as np
+from .parsing import column_layouts, read_attribute_column
+
+
+def get_data_block_collection(subtype):
+    # Imported here so the in-place writes can be benchmarked without Blender
+    import bpy
+
+    match subtype:
+        case "MESH":
+            return bpy.data.meshes
+        case "CURVE":
+            return bpy.data.hair_curves
+        case "POINTCLOUD":
+            return bpy.data.pointclouds
+        case "VOLUME":
+            return bpy.data.volumes
+        case "GREASEPENCIL":
+            return bpy.data.grease_pencils
+        case "ARMATURE":
+            return bpy.data.armatures
+    return None
+
+
+# Connectivity of a mesh as (collection, property, width). Written before the
+# generic attributes when the element counts match.
+mesh_topology = (
+    ("edges", "vertices", 2),
+    ("loops", "vertex_index", 1),
+    ("loops", "edge_index", 1),
+    ("polygons", "loop_start", 1),
+)
+
+
+def get_domain_sizes(subtype, data_block):
+    """Element counts per domain, None for subtypes that are not written in
+    place"""
+    match subtype:
+        case "MESH":
+            return (
+                len(data_block.vertices),
+                len(data_block.edges),
+                len(data_block.loops),
+                len(data_block.polygons),
+            )
+        case "POINTCLOUD":
+            return (len(data_block.points),)
+    return None
+
+
+def copy_property(source, target, collection, key, width):
+    items = getattr(source, collection)
+    column = np.empty(len(items) * width, dtype=np.int32)
+    items.foreach_get(key, column)
+    getattr(target, collection).foreach_set(key, column)
+
+
+def copy_attributes(source, target):
+    """Makes the generic attributes of target those of source. Internal
+    attributes, whose names start with a dot, are left to Blender. Returns
+    False if an attribute could not be created under its name, e.g. because a
+    vertex group of the owning object has it."""
+    attributes = target.attributes
+    source_attributes = {
+        attribute.name: attribute
+        for attribute in source.attributes
+        if not attribute.name.startswith(".")
+    }
+    stale = []
+    for attribute in attributes:
+        if attribute.name.startswith("."):
+            continue
+        other = source_attributes.get(attribute.name)
+        if (
+            other is None
+            or other.domain != attribute.domain
+            or other.data_type != attribute.data_type
+        ):
+            stale.append(attribute.name)
+    # Removing an attribute invalidates references to the others
+    for name in stale:
+        attributes.remove(attributes[name])
+    for name, attribute in source_attributes.items():
+        existing = attributes.get(name)
+        if existing is None:
+            existing = attributes.new(name, attribute.data_type, attribute.domain)
+            if existing is None:
+                return False
+            if existing.name != name:
+                # Blender made the name unique instead of failing
+                attributes.remove(existing)
+                return False
+        key = column_layouts[attribute.data_type][0]
+        existing.data.foreach_set(key, read_attribute_column(attribute).reshape(-1))
+    return True
+
+
+def copy_materials(source, target):
+    materials = list(source.materials)
+    if list(target.materials) == materials:
+        return
+    target.materials.clear()
+    for material in materials:
+        target.materials.append(material)
+
+
+def write_in_place(subtype, data_block, source):
+    """Writes source into data_block if both have the same element counts.
+    Returns whether it did; data-blocks with other counts have to be
+    swapped."""
+    sizes = get_domain_sizes(subtype, data_block)
+    if sizes is None or sizes != get_domain_sizes(subtype, source):
+        return False
+    for attribute in source.attributes:
+        if attribute.name.startswith("."):
+            continue
+        if attribute.data_type not in column_layouts:
+            # String attributes cannot be written in bulk
+            return False
+    if subtype == "MESH":
+        for collection, key, width in mesh_topology:
+            copy_property(source, data_block, collection, key, width)
+    if not copy_attributes(source, data_block):
+        return False
+    copy_materials(source, data_block)
+    if subtype == "MESH":
+        # Also clears the normals and other caches derived from the old
+        # positions and topology
+        data_block.update()
+    else:
+        data_block.update_tag()
+    return True
+
+
+class DataBlockPool:
+    """Data-blocks created by earlier runs, keyed by materialize name and
+    subtype. Rematerialized geometry is written into them when its element
+    counts match instead of copied into a new data-block, which would leave
+    the old one to be freed and its memory to be allocated again."""
+
+    def __init__(self):
+        self.orphans = None
+
+    def collect_orphans(self):
+        """Data-blocks materialize created that lost their object, e.g.
+        because it was deleted by hand. Only indexed when an object has to be
+        created."""
+        self.orphans = {}
+        for subtype in ("MESH", "POINTCLOUD"):
+            for data_block in get_data_block_collection(subtype):
+                name = data_block.get("materialize_name")
+                if name is not None and data_block.users == 0:
+                    self.orphans[(name, subtype)] = data_block
+
+    def take_orphan(self, name, subtype):
+        if self.orphans is None:
+            self.collect_orphans()
+        return self.orphans.pop((name, subtype), None)
+
+    def acquire(self, name, subtype, geometry, current=None):
+        """A data-block holding the geometry of a GeometryRef for the object
+        materialized as name. current is the data-block of the existing
+        object, if any. It or an orphan is reused if it can be written in
+        place, otherwise a copy of the geometry is returned."""
+        data_block = current
+        if data_block is None:
+            data_block = self.take_orphan(name, subtype)
+        if data_block is not None:
+            # Data-blocks shared with objects materialize does not manage
+            # are not written to
+            if data_block.users <= 1 and write_in_place(
+                subtype, data_block, geometry.component()
+            ):
+                return data_block
+            if current is None:
+                get_data_block_collection(subtype).remove(data_block)
+        data_block = geometry.realize()
+        data_block["materialize_name"] = name
+        return data_block
@@ -0,0 +1,97 @@
+import bpy
+import hashlib
+import mathutils
+from .parsing import geometry_components, read_attribute_column
+from .content_hash import hash_geometry_set
+
+
+def get_reference_component(reference):
+    """The first data-block component of a geometry set and its subtype.
+    Nested instances of a reference are not materialized."""
+    for subtype, component_name in geometry_components.items():
+        component = getattr(reference, component_name)
+        if component is not None:
+            return subtype, component
+    return None, None
+
+
+class InstanceDataBlocks:
+    """One data-block per unique instance reference. References are keyed by
+    content hash, so identical references collapse onto a single copy that
+    every instance of them links to."""
+
+    def __init__(self):
+        self.data_blocks = {}
+
+    def get(self, reference, profiler=None):
+        """The (subtype, data-block) of reference. New copies are counted in
+        profiler if given."""
+        hasher = hashlib.blake2b(digest_size=16)
+        hash_geometry_set(hasher, reference)
+        key = hasher.hexdigest()
+        if key not in self.data_blocks:
+            subtype, component = get_reference_component(reference)
+            data_block = None
+            if component is not None:
+                if profiler is None:
+                    data_block = component.copy()
+                else:
+                    with profiler.stage("copy"):
+                        data_block = component.copy()
+                    profiler.count_bytes(subtype, data_block)
+                if len(reference.name) > 0:
+                    data_block.name = reference.name
+            self.data_blocks[key] = (subtype, data_block)
+        return self.data_blocks[key]
+
+
+def resolve_reference(instance_data_blocks, reference, profiler=None):
+    """Returns (subtype, data-block, instance collection) for a reference"""
+    if isinstance(reference, bpy.types.Collection):
+        return None, None, reference
+    if isinstance(reference, bpy.types.Object):
+        # Linked duplicate of an object that is not managed by materialize
+        return None, reference.data, None
+    subtype, data_block = instance_data_blocks.get(reference, profiler)
+    return subtype, data_block, None
+
+
+def create_instance_objects(
+    instance_obj, geometry_ref, instance_data_blocks, profiler=None
+):
+    """Creates one object per instance, parented to instance_obj. Instances of
+    the same reference share its data-block; collection references become
+    collection instances. The data-blocks copied are counted in profiler if
+    given."""
+    geometry = geometry_ref.component()
+    pointcloud = geometry.instances_pointcloud()
+    references = geometry.instance_references()
+    if pointcloud is None or references is None:
+        return []
+    attributes = pointcloud.attributes
+    reference_indices = read_attribute_column(attributes[".reference_index"])
+    transforms = None
+    if "instance_transform" in attributes:
+        transforms = read_attribute_column(attributes["instance_transform"])
+    resolved = [
+        resolve_reference(instance_data_blocks, reference, profiler)
+        for reference in references
+    ]
+    new_objects = []
+    new_object = bpy.data.objects.new
+    for point, reference_index in enumerate(reference_indices.tolist()):
+        subtype, data_block, collection = resolved[reference_index]
+        obj = new_object(f"{instance_obj.name} {point}", data_block)
+        if collection is not None:
+            obj.instance_type = "COLLECTION"
+            obj.instance_collection = collection
+        if transforms is not None:
+            # foreach_get flattens matrices column by column
+            matrix = mathutils.Matrix(transforms[point].reshape(4, 4))
+            obj.matrix_basis = matrix.transposed()
+        obj.parent = instance_obj
+        obj["materialize"] = "CHILD"
+        obj["materialize_instance"] = True
+        obj["materialize_subtype"] = subtype or ""
+        new_objects.append(obj)
+    return new_objects
@@ -0,0 +1,150 @@
+import bpy
+import time
+from bpy.app.handlers import persistent
+from .utils import is_materialize_root
+
+# Seconds without edits before dirty roots are rematerialized. Also the
+# shortest time between two rebuilds.
+debounce_window = 0.3
+
+
+class LiveState:
+    """Roots whose evaluated geometry changed since they were last
+    materialized, and when the last edit and rebuild happened"""
+
+    def __init__(self):
+        self.dirty_roots = set()
+        self.last_edit = 0.0
+        self.last_rebuild = 0.0
+        self.scheduled = False
+        # Set while rebuilding, the updates materialize causes itself are not
+        # edits
+        self.rebuilding = False
+
+
+state = LiveState()
+
+
+def is_live_root(obj):
+    """Only roots that were materialized by hand before are rebuilt live, the
+    first materialization creates the collection and links it"""
+    if not is_materialize_root(obj):
+        return False
+    return obj.data is not None and "materialized" in obj.data
+
+
+def has_modal_operators():
+    """Whether a modal operator, e.g. a transform, is running in any window"""
+    window_manager = bpy.context.window_manager
+    if window_manager is None:
+        return False
+    for window in window_manager.windows:
+        if len(getattr(window, "modal_operators", ())) > 0:
+            return True
+    return False
+
+
+@persistent
+def track_geometry_updates(scene, depsgraph):
+    if state.rebuilding or not scene.mtlz_live_materialize:
+        return
+    dirty = False
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        obj = update.id
+        if not isinstance(obj, bpy.types.Object):
+            continue
+        obj = obj.original
+        if is_live_root(obj):
+            state.dirty_roots.add(obj.name)
+            dirty = True
+    if not dirty:
+        return
+    state.last_edit = time.monotonic()
+    if not state.scheduled:
+        state.scheduled = True
+        bpy.app.timers.register(rebuild_dirty_roots, first_interval=debounce_window)
+
+
+def rebuild_dirty_roots():
+    """Timer callback. Waits until no edit happened for a debounce window, so
+    a slider drag only rebuilds once it stops, then rematerializes every dirty
+    root. Returns the seconds until it wants to run again, or None."""
+    now = time.monotonic()
+    wait = max(
+        state.last_edit + debounce_window - now,
+        state.last_rebuild + debounce_window - now,
+    )
+    if wait > 0.0:
+        return wait
+    if has_modal_operators():
+        return debounce_window
+    from .materialize_operations import (
+        MaterializeSession,
+        exception_result,
+        format_errors,
+        materialize,
+        remove_unlinked_objects,
+    )
+
+    state.scheduled = False
+    roots = state.dirty_roots
+    state.dirty_roots = set()
+    state.rebuilding = True
+    try:
+        for name in sorted(roots):
+            obj = bpy.data.objects.get(name)
+            if obj is None or not is_live_root(obj):
+                continue
+            session = MaterializeSession()
+            try:
+                result = materialize(obj, bpy.context, session)
+            except Exception as exception:
+                # Reported like any other failure, the other roots are still
+                # rebuilt
+                remove_unlinked_objects(session)
+                result = exception_result(obj, exception, None)
+            if result["status"] == "ERROR":
+                print(f"Live materialize of {name} failed: {result['message']}")
+                print(format_errors(result["errors"]))
+    finally:
+        state.rebuilding = False
+        state.last_rebuild = time.monotonic()
+    return None
+
+
+@persistent
+def reset_live_state(_):
+    """Dirty roots and the pending rebuild belong to the file that was open.
+    Timers that are not persistent are dropped on load, which would leave
+    scheduled set and stop live materialize from ever scheduling again."""
+    if bpy.app.timers.is_registered(rebuild_dirty_roots):
+        bpy.app.timers.unregister(rebuild_dirty_roots)
+    state.dirty_roots.clear()
+    state.scheduled = False
+    state.rebuilding = False
+
+
+def register():
+    bpy.types.Scene.mtlz_live_materialize = bpy.props.BoolProperty(
+        name="Live",
+        description=(
+            "Rematerialize roots automatically shortly after their geometry changes"
+        ),
+        default=False,
+    )
+    bpy.app.handlers.depsgraph_update_post.append(track_geometry_updates)
+    bpy.app.handlers.load_post.append(reset_live_state)
+
+
+def unregister():
+    if track_geometry_updates in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(track_geometry_updates)
+    if reset_live_state in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(reset_live_state)
+    if bpy.app.timers.is_registered(rebuild_dirty_roots):
+        bpy.app.timers.unregister(rebuild_dirty_roots)
+    state.dirty_roots.clear()
+    state.scheduled = False
+    del bpy.types.Scene.mtlz_live_materialize
@@ -1,45 +1,151 @@
 import bpy
+import time
 from bpy.types import (
     Operator,
     Panel,
 )
 from bpy.props import StringProperty, EnumProperty, BoolProperty, PointerProperty
 import bl_ui.properties_data_modifier
-from .utils import get_evaluated_geometry, is_materialize_modifier, is_materialize_child
-from .parsing import concat_error_path, parse_objects
+from .utils import (
+    StageTimer,
+    get_evaluated_geometry,
+    is_materialize_modifier,
+    is_materialize_child,
+    is_materialize_root,
+)
+from .parsing import GeometryRef, ParseError, concat_error_path, iter_objects
+from .content_hash import hash_object_data
+from .armature_operations import build_armatures, flatten_bones
+from .instance_operations import InstanceDataBlocks, create_instance_objects
+from .stack_operations import apply_stacks
+from .name_resolver import ScopedResolver, get_resolver
+from .data_block_pool import DataBlockPool, get_data_block_collection
+from .materialized_index import build_materialized_index
+from .profiling import Profiler, draw_report, finish_profiling
+from .validation import IdTables, validate_geometry
+from .vertex_group_operations import assign_vertex_groups, default_weight_levels
+
+
+# Yielded by iter_materialize in batched runs once the armatures of its root
+# are queued on the session, see materialize_roots
+awaiting_bones = object()
+
+
+class MaterializeSession:
+    """State shared by everything materialized in one run, which can cover
+    several roots"""
+
+    def __init__(
+        self,
+        batched=False,
+        profile=False,
+        collection=None,
+        weight_levels=default_weight_levels,
+    ):
+        self.instance_data_blocks = InstanceDataBlocks()
+        self.data_blocks = DataBlockPool()
+        # Objects of the current root that still have to be linked into its
+        # materialize collection
+        self.created_objects = []
+        # Batches update the view layer once, after the last root, and build
+        # the bones of every root in one edit mode pass, see materialize_roots
+        self.batched = batched
+        # Armatures of a batch waiting for their bones, and those that were
+        # skipped once build_armatures ran
+        self.pending_armatures = []
+        self.skipped_armatures = []
+        self.profile = profile
+        # The Profiler of the current root if profiling, otherwise None
+        self.profiler = None
+        # Collection to link materialized objects into instead of the one
+        # created for each root
+        self.collection = collection
+        # Vertex group weights are rounded to this many levels, or written
+        # exactly if None, see group_by_weight
+        self.weight_levels = weight_levels
+
+
+def remove_orphaned_data_block(subtype, data_block):
+    if data_block is None or data_block.users > 0:
+        return
+    collection = get_data_block_collection(subtype)
+    if collection is not None:
+        collection.remove(data_block)
+
 
+def remove_instance_objects(obj):
+    for child in list(obj.children):
+        if child.get("materialize_instance"):
+            remove_object(child)
 
-def update_armature(context, armature_data_block, object_data):
-    pass
+
+def remove_object(obj):
+    remove_instance_objects(obj)
+    subtype = obj.get("materialize_subtype")
+    data_block = obj.data
+    bpy.data.objects.remove(obj)
+    remove_orphaned_data_block(subtype, data_block)
 
 
 def create_armature(context, object_data):
-    return {
-        "status": "ERROR",
-        "path": ["data", "geometry"],
-        "message": "Armatures are not yet supported",
-    }
+    """Creates an armature without bones. Bones can only be added in edit mode,
+    so they are built for all armatures at once by build_armatures"""
+    armature = bpy.data.armatures.new(object_data.data.name)
+    new_obj = bpy.data.objects.new(object_data.name, armature)
+    return {"status": "OK", "value": new_obj}
 
 
-def create_instance(context, data):
-    return {
-        "status": "ERROR",
-        "path": ["data", "geometry"],
-        "message": "Instances are not yet supported",
-    }
+def create_instance(context, object_data, session):
+    """Creates an empty whose children are the instances, sharing one
+    data-block per unique reference"""
+    new_obj = bpy.data.objects.new(object_data.name, None)
+    session.created_objects.extend(
+        create_instance_objects(
+            new_obj,
+            object_data.geometry,
+            session.instance_data_blocks,
+            session.profiler,
+        )
+    )
+    return {"status": "OK", "value": new_obj}
+
+
+def acquire_data_block(session, object_data, current=None):
+    geometry = object_data.geometry
+    profiler = session.profiler
+    if profiler is None:
+        return session.data_blocks.acquire(
+            object_data.name, geometry.subtype, geometry, current
+        )
+    with profiler.stage("copy"):
+        data_block = session.data_blocks.acquire(
+            object_data.name, geometry.subtype, geometry, current
+        )
+    profiler.count_bytes(geometry.subtype, data_block)
+    return data_block
 
 
-def create_geometry_data_block(context, object_data):
-    data_block_name = object_data["DATA"]["NAME"]
-    data_block = object_data["DATA"]["GEOMETRY"]["value"]
-    data_block.name = data_block_name
-    object_name = object_data["NAME"]
+def create_geometry_data_block(context, object_data, session):
+    data_block_name = object_data.data.name
+    data_block = acquire_data_block(session, object_data)
+    if data_block.name != data_block_name:
+        data_block.name = data_block_name
+    object_name = object_data.name
     new_obj = bpy.data.objects.new(object_name, data_block)
+    if object_data.geometry.subtype == "MESH":
+        assign_vertex_groups(
+            new_obj,
+            data_block,
+            object_data.data.vertex_groups,
+            session.weight_levels,
+        )
     return {"status": "OK", "value": new_obj}
 
 
-def create_or_update_object(root, parent, context, object_data):
-    subtype = object_data["DATA"]["GEOMETRY"]["subtype"]
+def create_or_update_object(root, parent, context, object_data, session):
+    """Creates the object and its data-block. Parenting, properties and
+    collection linking are done in bulk by materialize()"""
+    subtype = object_data.geometry.subtype
     new_obj = None
     match subtype:
         case "ARMATURE":
@@ -48,103 +154,389 @@ def create_or_update_object(root, parent, context, object_data):
                 return result
             new_obj = result["value"]
         case "MESH" | "CURVE" | "VOLUME" | "GREASEPENCIL" | "POINTCLOUD":
-            result = create_geometry_data_block(context, object_data)
+            result = create_geometry_data_block(context, object_data, session)
             if result["status"] == "ERROR":
                 return result
             new_obj = result["value"]
         case "INSTANCE":
-            result = create_instance(context, object_data)
+            result = create_instance(context, object_data, session)
             if result["status"] == "ERROR":
                 return result
             new_obj = result["value"]
-
-    new_obj.parent = parent
-    context.collection.objects.link(new_obj)
-    new_obj["materialize_name"] = object_data["DATA"]["NAME"]
-    new_obj["materialize_subtype"] = subtype
+    session.created_objects.append(new_obj)
     return {"status": "OK", "value": new_obj}
 
 
-def update_object(root, parent, context, existing_object, object_data):
-    # TODO: Armatures
-    # TODO: Everything else
-    return {
-        "status": "ERROR",
-        "message": "Cannot yet update objects",
-        "path": [existing_object.name],
-    }
-
-
-def update_data_block(context, data):
-    # TODO: Armatures
-    # TODO: Everything else
-    return {
-        "status": "ERROR",
-        "message": "Cannot yet update data-blocks",
-        "path": [],
-    }
+def update_data_block(context, existing_object, object_data, session):
+    subtype = object_data.geometry.subtype
+    if subtype == "INSTANCE":
+        remove_instance_objects(existing_object)
+        session.created_objects.extend(
+            create_instance_objects(
+                existing_object,
+                object_data.geometry,
+                session.instance_data_blocks,
+                session.profiler,
+            )
+        )
+        return {"status": "OK", "value": None}
+    if subtype == "ARMATURE":
+        # Rebuilt in place with the other armatures by build_armatures
+        existing_object.data.name = object_data.data.name
+        return {"status": "OK", "value": existing_object.data}
+    if subtype not in ("MESH", "CURVE", "VOLUME", "GREASEPENCIL", "POINTCLOUD"):
+        return {
+            "status": "ERROR",
+            "message": f"Cannot yet update {subtype.lower()} data-blocks",
+            "path": [existing_object.name],
+        }
+    if subtype == "MESH":
+        # Vertex groups share the attribute namespace of the mesh. The weight
+        # attributes written in place would be renamed around the old groups,
+        # and assign_vertex_groups replaces them anyway
+        existing_object.vertex_groups.clear()
+    old_data_block = existing_object.data
+    data_block = acquire_data_block(session, object_data, old_data_block)
+    if data_block.name != object_data.data.name:
+        data_block.name = object_data.data.name
+    if data_block is not old_data_block:
+        existing_object.data = data_block
+        remove_orphaned_data_block(subtype, old_data_block)
+    if subtype == "MESH":
+        assign_vertex_groups(
+            existing_object,
+            data_block,
+            object_data.data.vertex_groups,
+            session.weight_levels,
+        )
+    return {"status": "OK", "value": data_block}
 
 
-def try_find_in_children(root_obj, name):
-    children = root_obj.children
-    for child in children:
-        if "materialize_name" not in child:
-            continue
-        if child["materialize_name"] == name:
-            return child
-    return None
+def update_object(root, parent, context, existing_object, object_data, session):
+    subtype = object_data.geometry.subtype
+    if existing_object.get("materialize_subtype") != subtype:
+        # The type of an object cannot change, so it is replaced instead
+        remove_object(existing_object)
+        return create_or_update_object(root, parent, context, object_data, session)
+    result = update_data_block(context, existing_object, object_data, session)
+    if result["status"] == "ERROR":
+        return result
+    return {"status": "OK", "value": existing_object}
 
 
 def materialize_object(
-    root, parent, context, object_data, reference_geometry, existing_object
+    root, parent, context, object_data, reference_geometry, existing_object, session
 ):
-    create_object_result = create_or_update_object(root, parent, context, object_data)
-    print("hello", create_object_result)
-    if create_object_result["status"] == "ERROR":
-        return create_object_result
-    return {"status": "OK", "value": create_object_result["value"]}
+    content_hash = hash_object_data(object_data)
+    if existing_object is None:
+        result = create_or_update_object(root, parent, context, object_data, session)
+    elif existing_object.get("materialize_hash") == content_hash:
+        # Unchanged since the last materialization, only its parent may differ
+        return {
+            "status": "OK",
+            "value": existing_object,
+            "content_hash": None,
+        }
+    else:
+        # Cleared before anything is written. The new hash is only written
+        # once the bones and stacks are built too, and a run cut short after
+        # this, e.g. by a parse error in a later row, must not leave the
+        # object looking unchanged to the next run.
+        existing_object.pop("materialize_hash", None)
+        result = update_object(
+            root, parent, context, existing_object, object_data, session
+        )
+    if result["status"] == "ERROR":
+        return result
+    result["content_hash"] = content_hash
+    return result
 
 
-def materialize(root_obj, context):
-    data = get_evaluated_geometry(root_obj, context)
-    parse_result = parse_objects(data)
-    errors = []
-    if parse_result["status"] == "ERROR":
-        return concat_error_path(parse_result, root_obj.name)
-    objects = parse_result["value"]
+def set_materialize_properties(obj, name, subtype):
+    obj["materialize"] = "CHILD"
+    obj["materialize_name"] = name
+    obj["materialize_subtype"] = subtype
+
+
+def get_materialize_collection(root_obj, target=None):
+    """The collection objects materialized from root_obj are linked into, or
+    target if given, which is remembered for later runs. Returns whether it
+    was newly created and still has to be linked."""
+    if target is not None:
+        if root_obj.get("materialize_collection") != target:
+            root_obj["materialize_collection"] = target
+        return target, False
+    collection = root_obj.get("materialize_collection")
+    if collection is not None:
+        return collection, False
+    collection = bpy.data.collections.new(f"{root_obj.name} Materialized")
+    root_obj["materialize_collection"] = collection
+    return collection, True
+
+
+def remove_stale_objects(materialized_index, materialized_names):
+    for name, child in list(materialized_index.items()):
+        if name not in materialized_names:
+            del materialized_index[name]
+            remove_object(child)
+
+
+def iter_materialize(root_obj, context, session=None, data=None):
+    """materialize() as a generator that yields (objects done, object count)
+    after each parsed object, and between the steps that follow with every
+    object done, so it can be spread over several timer ticks. Returns the
+    result of materialize(). Closing it while objects are still being parsed
+    removes the objects it created; once they are linked, undo has to.
+
+    A context sent into it replaces context for the steps that follow, since
+    a context must not be used after the event it was passed with. With a
+    batched session it yields awaiting_bones once before building bones."""
+    if session is None:
+        session = MaterializeSession()
+    type_counts = None
+    if session.profile:
+        timer = session.profiler = Profiler(root_obj.name)
+        type_counts = timer.count_elements
+    else:
+        timer = StageTimer()
+    if data is None:
+        with timer.stage("evaluate"):
+            data = get_evaluated_geometry(root_obj, context)
+    # The id columns read by validation are not read again by the parser
+    id_tables = IdTables()
+    with timer.stage("validate"):
+        errors = validate_geometry(data, type_counts, id_tables)
+    if len(errors) > 0:
+        # Nothing has been created yet, report every problem at once
+        return {
+            "status": "ERROR",
+            "message": f"Invalid geometry, {len(errors)} problems found",
+            "path": [root_obj.name],
+            "errors": [concat_error_path(error, root_obj.name) for error in errors],
+            "timings": timer,
+        }
+
+    # Objects are created as soon as they are parsed, parents always come
+    # before their children. Datablocks and objects are created unlinked, so
+    # that no depsgraph relations are rebuilt while the hierarchy is being
+    # assembled
+    session.created_objects = []
+    materialized = []
+    armatures = []
+    stacks = []
+    # One entry per parsed object, so parent indices stay row numbers. Objects
+    # that failed are None, their children fail too.
     parents = [root_obj]
-    for object_data in objects:
-        name = object_data["NAME"]
-        parent_index = object_data["parent"] + 1
-        if parent_index < 0 or parent_index >= len(parents):
-            errors.append(
-                {
-                    "status": "ERROR",
-                    "message": f"Parent index {parent_index} out of range for {name}",
-                    "path": [root_obj.name, name],
-                }
-            )
-            continue
-        parent = parents[parent_index]
-        existing_object = try_find_in_children(root_obj, name)
-        reference_geometry = None
-        if "REFERENCE_GEOMETRY" in object_data:
-            reference_geometry = object_data["REFERENCE_GEOMETRY"]
-        materialize_result = materialize_object(
-            root_obj,
-            parent,
-            context,
-            existing_object,
-            object_data,
-            reference_geometry,
-            existing_object,
+    materialized_index = build_materialized_index(root_obj)
+    materialized_names = set()
+    object_count = len(data.instances_pointcloud().points)
+    try:
+        objects = timer.iterate("parse", iter_objects(data, id_tables=id_tables))
+        for done, object_data in enumerate(objects):
+            sent = yield done, object_count
+            context = context if sent is None else sent
+            with timer.stage("create"):
+                name = object_data.name
+                geometry = object_data.geometry
+                if geometry is None:
+                    parents.append(None)
+                    errors.append(
+                        {
+                            "status": "ERROR",
+                            "message": "Missing expected geometry data",
+                            "path": [root_obj.name, name or ""],
+                        }
+                    )
+                    continue
+                parent_index = object_data.parent_index + 1
+                if parent_index < 0 or parent_index >= len(parents):
+                    parents.append(None)
+                    if type(geometry) is GeometryRef:
+                        geometry.release()
+                    errors.append(
+                        {
+                            "status": "ERROR",
+                            "message": f"Parent index {parent_index} out of range for {name}",
+                            "path": [root_obj.name, name],
+                        }
+                    )
+                    continue
+                parent = parents[parent_index]
+                if parent is None:
+                    parents.append(None)
+                    if type(geometry) is GeometryRef:
+                        geometry.release()
+                    errors.append(
+                        {
+                            "status": "ERROR",
+                            "message": f"Parent of {name} failed to materialize",
+                            "path": [root_obj.name, name],
+                        }
+                    )
+                    continue
+                existing_object = materialized_index.get(name)
+                reference_geometry = object_data.reference_geometry
+                materialize_result = materialize_object(
+                    root_obj,
+                    parent,
+                    context,
+                    object_data,
+                    reference_geometry,
+                    existing_object,
+                    session,
+                )
+                if type(geometry) is GeometryRef:
+                    # Attached to its object by now, the evaluated geometry
+                    # and the copy are not needed anymore
+                    geometry.release()
+                if materialize_result["status"] == "ERROR":
+                    parents.append(None)
+                    errors.append(materialize_result)
+                    continue
+                new_obj = materialize_result["value"]
+                content_hash = materialize_result["content_hash"]
+                parents.append(new_obj)
+                materialized_index[name] = new_obj
+                materialized_names.add(name)
+                materialized.append(
+                    (new_obj, parent, name, geometry.subtype, content_hash)
+                )
+                if geometry.subtype == "ARMATURE" and content_hash is not None:
+                    armatures.append((new_obj, name, flatten_bones(geometry)))
+                # Reconciled for unchanged objects too, their targets may have
+                # been replaced
+                stacks.append(
+                    (new_obj, name, object_data.modifiers, object_data.constraints)
+                )
+    except ParseError as parse_error:
+        error = parse_error.to_result()
+        if len(session.created_objects) == 0:
+            error = concat_error_path(error, root_obj.name)
+            return {
+                "status": "ERROR",
+                "message": "",
+                "path": error["path"],
+                "errors": [error],
+                "timings": timer,
+            }
+        # Objects created before the error are still linked below, so that
+        # they are not left orphaned
+        errors.append(error)
+    except GeneratorExit:
+        # Cancelled, nothing has been linked yet. The data-blocks left behind
+        # are reused by the next run.
+        bpy.data.batch_remove(session.created_objects)
+        raise
+    # Not needed after parsing. In a batch this generator stays suspended
+    # while the next root is evaluated, which must not find the evaluated
+    # geometry of this one still alive, see GeometryRef.
+    data = objects = object_data = id_tables = None
+
+    with timer.stage("parent"):
+        for new_obj, parent, name, subtype, content_hash in materialized:
+            if new_obj.parent != parent:
+                new_obj.parent = parent
+            if content_hash is not None:
+                set_materialize_properties(new_obj, name, subtype)
+
+    # Every object is parsed, the steps below report full progress
+    finishing = (object_count, object_count)
+    sent = yield finishing
+    context = context if sent is None else sent
+    with timer.stage("link"):
+        collection, is_new_collection = get_materialize_collection(
+            root_obj, session.collection
         )
-        if materialize_result["status"] == "ERROR":
-            errors.append(materialize_result)
-        else:
-            parents.append(materialize_result["value"])
+        link = collection.objects.link
+        for new_obj in session.created_objects:
+            link(new_obj)
+        if is_new_collection:
+            context.collection.children.link(collection)
+
+    sent = yield finishing
+    context = context if sent is None else sent
+    # Objects whose bones or stacks could not be built, they keep no hash so
+    # that the next run builds them again
+    failed_names = set()
+    armature_bones = [(new_obj, bones) for new_obj, _, bones in armatures]
+    if session.batched:
+        session.pending_armatures.extend(armature_bones)
+        yield awaiting_bones
+        skipped = session.skipped_armatures
+    else:
+        with timer.stage("bones"):
+            skipped = build_armatures(context, armature_bones)
+    with timer.stage("bones"):
+        for new_obj, name, _ in armatures:
+            if new_obj in skipped:
+                failed_names.add(name)
+                errors.append(
+                    {
+                        "status": "ERROR",
+                        "message": (
+                            "Armature is not visible in the view layer, its bones"
+                            " cannot be edited"
+                        ),
+                        "path": [root_obj.name, name],
+                    }
+                )
+
+    with timer.stage("stacks"):
+        # Targets are resolved once every object exists, they can come after
+        # the objects pointing at them
+        resolver = get_resolver()
+        if len(armatures) > 0:
+            resolver.invalidate_bones()
+        resolver = ScopedResolver(
+            resolver,
+            {name: materialized_index[name] for name in materialized_names},
+        )
+    # Hooks are bound once every stack is built, see bind_hook
+    binds = []
+    for new_obj, name, modifiers, constraints in stacks:
+        sent = yield finishing
+        context = context if sent is None else sent
+        with timer.stage("stacks"):
+            try:
+                apply_stacks(new_obj, modifiers, constraints, resolver, binds)
+            except (TypeError, ValueError, RuntimeError) as error:
+                # Values the modifier or constraint does not accept, such as
+                # a pose space on an object constraint or vertex indices out
+                # of range
+                failed_names.add(name)
+                errors.append(
+                    {
+                        "status": "ERROR",
+                        "message": str(error),
+                        "path": [root_obj.name, name],
+                    }
+                )
+
+    if len(binds) > 0:
+        with timer.stage("bind"):
+            # Hooks are bound to where their targets are now, which the
+            # depsgraph has not evaluated yet for objects created or moved
+            # above. Batches pay for this update once per root with hooks.
+            context.view_layer.update()
+            for bind, target in binds:
+                bind(target)
+
+    for new_obj, _, name, _, content_hash in materialized:
+        if content_hash is not None and name not in failed_names:
+            new_obj["materialize_hash"] = content_hash
+
+    sent = yield finishing
+    context = context if sent is None else sent
+    if len(errors) == 0:
+        with timer.stage("remove"):
+            remove_stale_objects(materialized_index, materialized_names)
+
+    if not session.batched:
+        with timer.stage("update"):
+            context.view_layer.update()
+
     if len(errors) == 0:
-        return {"status": "OK"}
+        return {"status": "OK", "objects": len(materialized), "timings": timer}
     elif len(errors) == 1:
         error = concat_error_path(errors[0], root_obj.name)
         return {
@@ -152,6 +544,8 @@ def materialize(root_obj, context):
             "message": "",
             "path": error["path"],
             "errors": [error],
+            "objects": len(materialized),
+            "timings": timer,
         }
     else:
         return {
@@ -159,9 +553,137 @@ def materialize(root_obj, context):
             "message": f"Multiple errors ocurred",
             "path": [root_obj.name],
             "errors": errors,
+            "objects": len(materialized),
+            "timings": timer,
         }
 
 
+def materialize(root_obj, context, session=None, data=None):
+    steps = iter_materialize(root_obj, context, session, data)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def get_materialize_roots(context, scope="SELECTED"):
+    """The materialize roots among the selected objects, or in the scene"""
+    if scope == "SCENE":
+        objects = context.scene.objects
+    else:
+        objects = context.selected_objects
+    return [obj for obj in objects if is_materialize_root(obj)]
+
+
+def remove_unlinked_objects(session):
+    """Removes the objects a run that raised created but did not link yet,
+    which would otherwise be left orphaned"""
+    bpy.data.batch_remove(
+        [obj for obj in session.created_objects if len(obj.users_collection) == 0]
+    )
+    session.created_objects = []
+
+
+def exception_result(root_obj, exception, timings):
+    error = {
+        "status": "ERROR",
+        "message": f"{type(exception).__name__}: {exception}",
+        "path": [root_obj.name],
+    }
+    return {**error, "errors": [error], "timings": timings}
+
+
+def advance_root(root, steps, session):
+    """Runs the iter_materialize generator of root until it waits for the
+    bones of the batch or finishes. Returns its result, or None if it is
+    waiting"""
+    while True:
+        try:
+            step = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        except Exception as exception:
+            remove_unlinked_objects(session)
+            timings = session.profiler if session.profile else StageTimer()
+            return exception_result(root, exception, timings)
+        if step is awaiting_bones:
+            return None
+
+
+def materialize_roots(
+    roots,
+    context,
+    profile=False,
+    collection=None,
+    weight_levels=default_weight_levels,
+):
+    """Materializes several roots in one run. Each root is evaluated right
+    before it is materialized and its evaluated geometry dropped once parsed,
+    so only one root's is alive at a time. The data-block and instance caches
+    are shared between roots, the bones of every root are built in one edit
+    mode pass and the view layer is updated once at the end. A root that
+    fails, even by raising, does not stop the others, their errors are
+    collected in the result. Only roots that succeeded are marked as
+    materialized."""
+    timer = StageTimer()
+    session = MaterializeSession(
+        batched=True,
+        profile=profile,
+        collection=collection,
+        weight_levels=weight_levels,
+    )
+    results = {}
+    # Roots waiting for the bones, with their generators and profilers
+    waiting = []
+    for root in roots:
+        with timer.stage("evaluate"):
+            data = get_evaluated_geometry(root, context)
+        with timer.stage("materialize"):
+            steps = iter_materialize(root, context, session, data)
+            del data
+            result = advance_root(root, steps, session)
+        if result is None:
+            waiting.append((root, steps, session.profiler))
+        else:
+            results[root.name] = result
+    with timer.stage("bones"):
+        try:
+            session.skipped_armatures = build_armatures(
+                context, session.pending_armatures
+            )
+        except Exception as exception:
+            for root, steps, profiler in waiting:
+                steps.close()
+                timings = profiler if profile else StageTimer()
+                results[root.name] = exception_result(root, exception, timings)
+            waiting = []
+    for root, steps, profiler in waiting:
+        session.profiler = profiler
+        with timer.stage("materialize"):
+            results[root.name] = advance_root(root, steps, session)
+    errors = []
+    for root in roots:
+        result = results[root.name]
+        if result["status"] == "ERROR":
+            errors.extend(result["errors"])
+        elif root.data is not None:
+            root.data["materialized"] = True
+    with timer.stage("update"):
+        context.view_layer.update()
+    if len(errors) == 0:
+        return {"status": "OK", "results": results, "timings": timer}
+    failed = sum(1 for result in results.values() if result["status"] == "ERROR")
+    return {
+        "status": "ERROR",
+        "message": f"{failed} of {len(results)} roots failed",
+        "path": [],
+        "errors": errors,
+        "results": results,
+        "timings": timer,
+    }
+
+
 def format_errors(errors):
     result = []
     for error in errors:
@@ -186,7 +708,10 @@ def poll(cls, context):
 
     def execute(self, context):
         obj = context.object
-        materialize_result = materialize(obj, context)
+        session = MaterializeSession(profile=context.scene.mtlz_profile)
+        materialize_result = materialize(obj, context, session)
+        if session.profile:
+            finish_profiling(context.scene, [materialize_result["timings"]])
         if materialize_result["status"] == "ERROR":
             msg = materialize_result["message"]
             formatted_errors = format_errors(materialize_result["errors"])
@@ -194,6 +719,8 @@ def execute(self, context):
                 {"ERROR_INVALID_INPUT"},
                 f"{msg}\n{formatted_errors}",
             )
+        else:
+            self.report({"INFO"}, materialize_result["timings"].format())
         obj.data["materialized"] = True
         return {"FINISHED"}
 
@@ -213,13 +740,18 @@ def poll(cls, context):
 
     def execute(self, context):
         obj = context.object
-        materialize_result = materialize(obj, context)
+        session = MaterializeSession(profile=context.scene.mtlz_profile)
+        materialize_result = materialize(obj, context, session)
+        if session.profile:
+            finish_profiling(context.scene, [materialize_result["timings"]])
         if materialize_result["status"] == "ERROR":
             msg = materialize_result["message"]
             self.report(
                 {"ERROR_INVALID_INPUT"},
                 f"{msg}\n" + format_errors(materialize_result["errors"]),
             )
+        else:
+            self.report({"INFO"}, materialize_result["timings"].format())
         obj.data["materialized"] = True
         return {"FINISHED"}
 
@@ -232,6 +764,177 @@ def invoke(self, context, event):
         )
 
 
+class Modifier_OT_MaterializeModalOperator(Operator):
+    """Materializes an object hierachy from geometry data in the background,
+    a slice at a time. Esc cancels and restores the previous state. Other
+    input is blocked while it runs, except for navigating the view: undo,
+    deleting objects or running it again would pull the objects it is
+    working on out from under it"""
+
+    bl_idname = "mtlz.materialize_objects_modal"
+    bl_label = "Materialize Nodes (Background)"
+    bl_description = "Materialize without blocking the interface, Esc to cancel"
+    bl_options = {"REGISTER", "UNDO"}
+
+    # Seconds of work per timer tick, and the time between ticks. Most of the
+    # time goes to work, so throughput stays close to materialize()
+    time_budget = 0.1
+    tick_interval = 0.005
+    # Events passed on while running, they only move the view
+    passed_events = {
+        "MOUSEMOVE",
+        "INBETWEEN_MOUSEMOVE",
+        "MIDDLEMOUSE",
+        "WHEELUPMOUSE",
+        "WHEELDOWNMOUSE",
+        "TRACKPADPAN",
+        "TRACKPADZOOM",
+        "MOUSEROTATE",
+        "MOUSESMARTZOOM",
+        "WINDOW_DEACTIVATE",
+    }
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.object
+        return obj
+
+    def invoke(self, context, event):
+        self.root = context.object
+        # Restored on cancel, which also reverts objects that were updated
+        # rather than created
+        self.can_undo = bpy.ops.ed.undo_push.poll()
+        if self.can_undo:
+            bpy.ops.ed.undo_push(message="Before Materialize")
+        self.session = MaterializeSession(profile=context.scene.mtlz_profile)
+        # Started on the first tick, every tick sends it its own context
+        self.steps = None
+        wm = context.window_manager
+        self.progress_total = None
+        self.timer = wm.event_timer_add(self.tick_interval, window=context.window)
+        wm.modal_handler_add(self)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            return self.cancel_run(context)
+        if event.type == "TIMER" and event.timer is self.timer:
+            return self.run_tick(context)
+        if event.type in self.passed_events or event.type.startswith(
+            ("TIMER", "NDOF_")
+        ):
+            return {"PASS_THROUGH"}
+        return {"RUNNING_MODAL"}
+
+    def run_tick(self, context):
+        wm = context.window_manager
+        deadline = time.perf_counter() + self.time_budget
+        try:
+            while time.perf_counter() < deadline:
+                if self.steps is None:
+                    self.steps = iter_materialize(self.root, context, self.session)
+                    done, total = next(self.steps)
+                else:
+                    done, total = self.steps.send(context)
+                if self.progress_total is None:
+                    self.progress_total = total
+                    wm.progress_begin(0, max(total, 1))
+                wm.progress_update(done)
+        except StopIteration as stop:
+            self.finish(context)
+            if self.session.profile:
+                finish_profiling(context.scene, [stop.value["timings"]])
+            self.report_result(stop.value)
+            return {"FINISHED"}
+        except Exception as exception:
+            # The generator is done for, undo what it did before raising
+            remove_unlinked_objects(self.session)
+            self.finish(context)
+            if self.can_undo:
+                bpy.ops.ed.undo()
+            errors = exception_result(self.root, exception, None)["errors"]
+            self.report({"ERROR"}, f"Materialize failed\n{format_errors(errors)}")
+            return {"CANCELLED"}
+        return {"RUNNING_MODAL"}
+
+    def cancel_run(self, context):
+        if self.steps is not None:
+            self.steps.close()
+        self.finish(context)
+        if self.can_undo:
+            bpy.ops.ed.undo()
+        self.report({"WARNING"}, "Materialize cancelled")
+        return {"CANCELLED"}
+
+    def cancel(self, context):
+        # Called by Blender when it stops the operator itself, e.g. when
+        # another file is loaded. The undo history is not reliable then, so
+        # only what was not linked yet is removed.
+        if self.steps is not None:
+            self.steps.close()
+        self.finish(context)
+
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        if self.progress_total is not None:
+            wm.progress_end()
+
+    def report_result(self, materialize_result):
+        if materialize_result["status"] == "ERROR":
+            msg = materialize_result["message"]
+            self.report(
+                {"ERROR_INVALID_INPUT"},
+                f"{msg}\n" + format_errors(materialize_result["errors"]),
+            )
+        else:
+            self.report({"INFO"}, materialize_result["timings"].format())
+        self.root.data["materialized"] = True
+
+
+class Modifier_OT_MaterializeRootsOperator(Operator):
+    """(Re)Materializes every selected materialize root, or every root in the
+    scene"""
+
+    bl_idname = "mtlz.materialize_roots"
+    bl_label = "(Re)Materialize All"
+    bl_description = "Materialize several roots in one batch"
+    bl_options = {"REGISTER", "UNDO"}
+
+    scope: EnumProperty(
+        name="Scope",
+        items=[
+            ("SELECTED", "Selected", "The selected materialize roots"),
+            ("SCENE", "Scene", "Every materialize root in the scene"),
+        ],
+        default="SELECTED",
+    )  # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene is not None
+
+    def execute(self, context):
+        roots = get_materialize_roots(context, self.scope)
+        if len(roots) == 0:
+            self.report({"WARNING"}, "No materialize roots found")
+            return {"CANCELLED"}
+        profile = context.scene.mtlz_profile
+        materialize_result = materialize_roots(roots, context, profile)
+        if profile:
+            results = materialize_result["results"].values()
+            finish_profiling(context.scene, [result["timings"] for result in results])
+        if materialize_result["status"] == "ERROR":
+            msg = materialize_result["message"]
+            self.report(
+                {"ERROR_INVALID_INPUT"},
+                f"{msg}\n" + format_errors(materialize_result["errors"]),
+            )
+        else:
+            self.report({"INFO"}, materialize_result["timings"].format())
+        return {"FINISHED"}
+
+
 class OBJ_OT_template_group_add(Operator):
     """Creates a new node group that outputs a materialized object"""
 
@@ -296,6 +999,18 @@ def draw_materialize_button(self, context):
             text="(Re)Materialize",
             icon_value=get_icons()["materialize_icon"].icon_id,
         )
+        layout.prop(context.scene, "mtlz_live_materialize", toggle=True)
+    layout.operator(
+        Modifier_OT_MaterializeModalOperator.bl_idname, text="", icon="TIME"
+    )
+    layout.operator(
+        Modifier_OT_MaterializeRootsOperator.bl_idname, text="", icon="SCENE_DATA"
+    ).scope = "SCENE"
+    layout.prop(context.scene, "mtlz_profile", text="", icon="SORTTIME")
+    if context.scene.mtlz_profile:
+        column = self.layout.column()
+        column.prop(context.scene, "mtlz_trace_path")
+        draw_report(column, obj)
 
 
 def draw_add_materialize_modifier(self, context):
@@ -336,6 +1051,8 @@ def remove_modifier_panel():
 
 classes = (
     Modifier_OT_MaterializeOperator,
+    Modifier_OT_MaterializeModalOperator,
+    Modifier_OT_MaterializeRootsOperator,
     Modifier_OT_RematerializeOperator,
     OBJ_OT_template_group_add,
 )
@@ -0,0 +1,10 @@
+def build_materialized_index(root_obj):
+    """Maps materialize_name to every object previously materialized under
+    root_obj, including those parented to other materialized objects. Built
+    once per run, so looking up each parsed object is constant time."""
+    index = {}
+    for child in root_obj.children_recursive:
+        name = child.get("materialize_name")
+        if name is not None:
+            index[name] = child
+    return index
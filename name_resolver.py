@@ -0,0 +1,139 @@
+import bpy
+from bpy.app.handlers import persistent
+
+# The bpy.data collections references and targets are resolved in, by the
+# kind of ID
+id_collections = {
+    "OBJECT": "objects",
+    "MATERIAL": "materials",
+    "IMAGE": "images",
+    "COLLECTION": "collections",
+}
+
+
+class NameResolver:
+    """Turns the names references and targets are flattened into back into
+    IDs. Each kind is indexed once, on first use, and kept until a rename
+    invalidates the resolver.
+
+    Renames made from Python do not notify msgbus, so hits are checked against
+    the ID's current name and a stale index is rebuilt. Names missing from an
+    index are looked up directly, for IDs created after it was built."""
+
+    def __init__(self):
+        self.indices = {}
+        self.bone_names = {}
+
+    def build_index(self, kind):
+        index = {}
+        for id in getattr(bpy.data, id_collections[kind]):
+            # Linked IDs can share a name with a local one, the local one wins
+            if id.name not in index or id.library is None:
+                index[id.name] = id
+        self.indices[kind] = index
+        return index
+
+    def get(self, kind, name):
+        """The ID of kind with name, or None"""
+        if not name:
+            return None
+        index = self.indices.get(kind)
+        if index is None:
+            index = self.build_index(kind)
+        id = index.get(name)
+        if id is not None:
+            try:
+                if id.name == name:
+                    return id
+            except ReferenceError:
+                pass
+            index = self.build_index(kind)
+            return index.get(name)
+        id = getattr(bpy.data, id_collections[kind]).get(name)
+        if id is not None:
+            index[name] = id
+        return id
+
+    def has_bone(self, armature_obj, name):
+        """Whether the armature of armature_obj has a bone with name"""
+        armature = armature_obj.data
+        key = armature.as_pointer()
+        names = self.bone_names.get(key)
+        if names is None:
+            names = frozenset(bone.name for bone in armature.bones)
+            self.bone_names[key] = names
+        return name in names
+
+    def invalidate_bones(self):
+        """Bone names are re-read after armatures are rebuilt"""
+        self.bone_names.clear()
+
+
+resolver = None
+
+
+def get_resolver():
+    global resolver
+    if resolver is None:
+        resolver = NameResolver()
+    return resolver
+
+
+def invalidate_resolver(*args):
+    global resolver
+    resolver = None
+
+
+# Owner of the rename subscriptions, so they can be cleared together
+subscription_owner = object()
+
+renamed_properties = (
+    (bpy.types.Object, "name"),
+    (bpy.types.Material, "name"),
+    (bpy.types.Image, "name"),
+    (bpy.types.Collection, "name"),
+    (bpy.types.Bone, "name"),
+)
+
+
+def subscribe_renames():
+    for key in renamed_properties:
+        bpy.msgbus.subscribe_rna(
+            key=key,
+            owner=subscription_owner,
+            args=(),
+            notify=invalidate_resolver,
+        )
+
+
+def unsubscribe_renames():
+    bpy.msgbus.clear_by_owner(subscription_owner)
+    invalidate_resolver()
+
+
+@persistent
+def resubscribe_renames(_):
+    """Subscriptions do not survive loading a file, and neither do the IDs the
+    resolver points at"""
+    invalidate_resolver()
+    subscribe_renames()
+
+
+class ScopedResolver:
+    """Resolves the materialize names of the objects of one run to those
+    objects, which may have been given other names by Blender, and everything
+    else through resolver"""
+
+    def __init__(self, resolver, objects):
+        self.resolver = resolver
+        self.objects = objects
+
+    def get(self, kind, name):
+        if kind == "OBJECT":
+            obj = self.objects.get(name)
+            if obj is not None:
+                return obj
+        return self.resolver.get(kind, name)
+
+    def has_bone(self, armature_obj, name):
+        return self.resolver.has_bone(armature_obj, name)
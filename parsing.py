@@ -1,4 +1,6 @@
-import bpy
+import mathutils
+import numpy as np
+from types import MappingProxyType
 
 
 def concat_error_path(error, part):
@@ -57,7 +59,8 @@ def concat_error_path(error, part):
 }
 
 subtype_type_ids = {
-    "SPACE": space_type_ids,
+    "OWNER_SPACE": space_type_ids,
+    "TARGET_SPACE": space_type_ids,
     "MODIFIER": modifier_type_ids,
     "CONSTRAINT": constraint_type_ids,
     "GEOMETRY": data_block_type_ids,
@@ -75,10 +78,6 @@ def concat_error_path(error, part):
 }
 
 
-def parse_name(child):
-    return {"status": "OK", "type": "NAME", "value": child.name}
-
-
 def get_attribute_value(data_type, attribute_value):
     if (
         data_type == "FLOAT_VECTOR"
@@ -93,326 +92,729 @@ def get_attribute_value(data_type, attribute_value):
         return attribute_value.value
 
 
-def parse_attributes(index, pointcloud, _child):
-    values = {}
-    for [attribute_name, attribute] in pointcloud.attributes.items():
-        if (
-            attribute_name == ".reference_index"
-            or attribute_name == "type"
-            or attribute_name == "subtype"
-        ):
-            continue
-        value = attribute.data[index]
-        values[attribute_name] = get_attribute_value(attribute.data_type, value)
-    return {"status": "OK", "type": "ATTRIBUTES", "value": values}
-
-
-def parse_element_bag(type, index, parent_pointcloud, child):
-    subtype = None
-    subtypes = None
-    if type in subtype_type_ids:
-        subtypes = subtype_type_ids[type]
-    if subtypes is not None:
-        subtype_ids_attribute = parent_pointcloud.attributes["subtype"]
-        subtype = subtype_ids_attribute.data[index]
-        subtype = subtypes[
-            get_attribute_value(subtype_ids_attribute.data_type, subtype)
+# Attributes that describe the instance hierarchy rather than element values
+reserved_attribute_names = {".reference_index", "type", "subtype"}
+
+# foreach_get property name, component count and buffer dtype for the attribute
+# data types that can be read in bulk. Anything else is read one element at a time.
+column_layouts = {
+    "FLOAT": ("value", 1, np.float32),
+    "INT": ("value", 1, np.int32),
+    "INT8": ("value", 1, np.int32),
+    "BOOLEAN": ("value", 1, np.bool_),
+    "FLOAT_VECTOR": ("vector", 3, np.float32),
+    "FLOAT2": ("vector", 2, np.float32),
+    "INT16_2D": ("value", 2, np.int32),
+    "INT32_2D": ("value", 2, np.int32),
+    "FLOAT_COLOR": ("color", 4, np.float32),
+    "BYTE_COLOR": ("color", 4, np.float32),
+    "QUATERNION": ("value", 4, np.float32),
+    "FLOAT4X4": ("value", 16, np.float32),
+}
+
+vector_data_types = {"FLOAT_VECTOR", "FLOAT2", "INT16_2D", "INT32_2D"}
+color_data_types = {"FLOAT_COLOR", "BYTE_COLOR"}
+
+
+def read_attribute_column(attribute):
+    data = attribute.data
+    layout = column_layouts.get(attribute.data_type)
+    if layout is None:
+        return [get_attribute_value(attribute.data_type, value) for value in data]
+    key, width, dtype = layout
+    column = np.empty(len(data) * width, dtype=dtype)
+    data.foreach_get(key, column)
+    if width > 1:
+        column = column.reshape(-1, width)
+    return column
+
+
+def get_column_value(data_type, column, index):
+    value = column[index]
+    if data_type in vector_data_types or data_type in color_data_types:
+        return mathutils.Vector(value).freeze()
+    if data_type == "QUATERNION":
+        return mathutils.Quaternion(value).freeze()
+    if data_type == "FLOAT4X4":
+        # foreach_get flattens matrices column by column
+        return mathutils.Matrix(value.reshape(4, 4)).transposed().freeze()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def read_id_column(attributes, attribute_name):
+    if attribute_name not in attributes:
+        return None
+    attribute = attributes[attribute_name]
+    column = read_attribute_column(attribute)
+    if isinstance(column, np.ndarray):
+        return column.tolist()
+    return column
+
+
+class InstanceTable:
+    """The instances of a geometry set, decoded once per parse. Attribute
+    columns are only read when an element type that uses them asks for them."""
+
+    def __init__(self, pointcloud, references, id_columns=None):
+        attributes = pointcloud.attributes
+        if id_columns is not None:
+            # Already read by validation
+            [
+                self.references,
+                self.reference_indices,
+                self.type_ids,
+                self.subtype_ids,
+            ] = id_columns
+        else:
+            self.references = references
+            self.reference_indices = (
+                read_id_column(attributes, ".reference_index") or []
+            )
+            count = len(self.reference_indices)
+            self.type_ids = read_id_column(attributes, "type") or [0] * count
+            self.subtype_ids = read_id_column(attributes, "subtype")
+        self.attributes = [
+            (attribute_name, attribute)
+            for [attribute_name, attribute] in attributes.items()
+            if attribute_name not in reserved_attribute_names
         ]
-    attributes_result = parse_attributes(index, parent_pointcloud, child)
-    if attributes_result["status"] == "ERROR":
-        return concat_error_path(attributes_result, "bone")
-    value = {}
-    concat_to_values(attributes_result, value)
-    pointcloud = child.instances_pointcloud()
-    instance_references = child.instance_references()
-    if pointcloud is None or instance_references is None:
-        value["subtype"] = subtype
-        return {
-            "status": "OK",
-            "type": type,
-            "subtype": subtype,
-            "value": value,
-        }
-
-    reference_indices = pointcloud.attributes[".reference_index"]
-    for i in reference_indices.data:
-        child = instance_references[i.value]
-        element_result = parse_element(i.value, pointcloud, child)
-        if element_result["status"] == "ERROR":
-            return concat_error_path(element_result, child.name)
-        concat_to_values(element_result, value)
-        value["subtype"] = subtype
-    return {
-        "status": "OK",
-        "type": type,
-        "subtype": subtype,
-        "value": value,
+        self.projections = {}
+
+    def project(self, columns):
+        """The (name, data type, column) of the attributes named in columns, or
+        of every attribute for None"""
+        projection = self.projections.get(columns)
+        if projection is None:
+            projection = [
+                (attribute_name, attribute.data_type, read_attribute_column(attribute))
+                for [attribute_name, attribute] in self.attributes
+                if columns is None or attribute_name in columns
+            ]
+            self.projections[columns] = projection
+        return projection
+
+
+class ParseContext:
+    """Caches the instance table of every geometry set visited by a parse.
+
+    Tables are keyed by id(); the geometry set is kept alive by its table so
+    the id cannot be reused while the context is alive. Elements of the types
+    in passthrough keep all their attributes instead of only those in their
+    schema. id_tables are the id columns validate_geometry read, see
+    validation.IdTables."""
+
+    def __init__(self, passthrough=(), id_tables=None):
+        self.tables = {}
+        self.passthrough = frozenset(passthrough)
+        self.id_tables = id_tables
+
+    def get_table(self, geometry):
+        key = id(geometry)
+        cached = self.tables.get(key)
+        if cached is not None:
+            return cached[1]
+        table = None
+        pointcloud = geometry.instances_pointcloud()
+        id_columns = None
+        if self.id_tables is not None:
+            id_columns = self.id_tables.take(geometry)
+        if id_columns is not None:
+            table = InstanceTable(pointcloud, None, id_columns)
+        else:
+            references = geometry.instance_references()
+            if pointcloud is not None and references is not None:
+                table = InstanceTable(pointcloud, references)
+        self.tables[key] = (geometry, table)
+        return table
+
+    def get_columns(self, decoder):
+        if decoder.type_name in self.passthrough:
+            return None
+        return decoder.columns
+
+    def release(self):
+        self.tables.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+
+class ParseError(Exception):
+    """A parse failure. The path is only resolved when the error is reported,
+    by walking the chain of frames the error was raised under."""
+
+    def __init__(self, message, path=None):
+        super().__init__(message)
+        self.message = message
+        self.path = path if path is not None else []
+        self.frame = None
+
+    def located(self, frame, name):
+        if len(name) > 0:
+            self.path.insert(0, name)
+        self.frame = frame
+        return self
+
+    def error_path(self):
+        segments = []
+        frame = self.frame
+        while frame is not None:
+            segments.append(frame.path_segment())
+            frame = frame.parent
+        path = []
+        for segment in reversed(segments):
+            path.extend(segment)
+        path.extend(self.path)
+        return path
+
+    def to_result(self):
+        return {"status": "ERROR", "message": self.message, "path": self.error_path()}
+
+
+# Shared by records without attributes or unslotted child elements. Frames
+# replace it with a dict of their own before adding anything.
+no_values = MappingProxyType({})
+
+
+class ElementRecord:
+    """A parsed element.
+
+    type_id and subtype_id are the integer ids from the type tables, name is
+    set by a NAME child and attributes holds the element's attribute values.
+    Child elements are stored in the slot element_slots names for their type,
+    or by type name in elements if the record has no slot for it. A child is a
+    record, a GeometryRef or, for collections, a list of them."""
+
+    __slots__ = ("type_id", "subtype_id", "name", "attributes", "elements")
+
+    element_slots = {}
+
+    def __init__(self, type_id, subtype_id=None, attributes=no_values):
+        self.type_id = type_id
+        self.subtype_id = subtype_id
+        self.name = None
+        self.attributes = attributes
+        self.elements = no_values
+        for slot in self.element_slots.values():
+            setattr(self, slot, None)
+
+    @property
+    def type(self):
+        return type_ids[self.type_id]
+
+    @property
+    def subtype(self):
+        if self.subtype_id is None:
+            return None
+        return element_decoders[self.type_id].subtypes[self.subtype_id]
+
+    def get(self, type_name, default=None):
+        slot = self.element_slots.get(type_name)
+        value = self.elements.get(type_name) if slot is None else getattr(self, slot)
+        return default if value is None else value
+
+    def content(self):
+        """Everything parsed into the record, for hashing and comparison"""
+        slots = [getattr(self, slot) for slot in self.element_slots.values()]
+        return (self.name, self.attributes, self.elements, *slots)
+
+
+class ObjectRecord(ElementRecord):
+    __slots__ = ("data", "modifiers", "constraints", "reference_geometry")
+
+    element_slots = {
+        "DATA": "data",
+        "MODIFIERS": "modifiers",
+        "CONSTRAINTS": "constraints",
+        "REFERENCE_GEOMETRY": "reference_geometry",
     }
 
+    @property
+    def geometry(self):
+        if self.data is None:
+            return None
+        return self.data.geometry
 
-def parse_collection(type_name, index, parent_pointcloud, child):
-    pointcloud = child.instances_pointcloud()
-    instance_references: list = child.instance_references()
-    if pointcloud is None or instance_references is None:
-        return {"status": "OK", "values": []}
-    reference_indices = pointcloud.attributes[".reference_index"]
-    values = []
-    for i in reference_indices.data:
-        child = instance_references[i.value]
-        element_result = parse_element(i.value, pointcloud, child)
-        if element_result["status"] == "ERROR":
-            return concat_error_path(element_result, child.name)
-        values.append(element_result["value"])
-    return {"status": "OK", "type": type_name, "value": values}
+    @property
+    def parent_index(self):
+        return self.attributes.get("parent", -1)
 
 
-def parse_selection(index, parent_pointcloud, child):
-    mesh = child.mesh
-    if mesh is None or "index" not in mesh.attributes:
-        return {"status": "ERROR", "message": "Expected indices", "path": ["selection"]}
-    bag_result = parse_element_bag("SELECTION", index, parent_pointcloud, child)
-    if bag_result["status"] == "ERROR":
-        return concat_error_path(bag_result, "selection")
-    value = bag_result["value"]
-    indices = []
-    value["indices"] = indices
-    index_attribute = mesh.attributes["index"]
-    for v in mesh.vertices:
-        indices.append(
-            get_attribute_value(
-                index_attribute.data_type, index_attribute.data[v.index]
-            )
-        )
-    return {"status": "OK", "type": "SELECTION", "value": value}
-
-
-def parse_element(index, pointcloud, child):
-    type_ids_attribute = pointcloud.attributes["type"]
-    type = type_ids_attribute.data[index]
-    type_id = get_attribute_value(type_ids_attribute.data_type, type)
-    type_name = type_ids[type_id]
-    match type_name:
-        case "OBJECT":
-            return parse_object(index, pointcloud, child)
-        case "BONE":
-            return parse_element_bag("BONE", index, pointcloud, child)
-        case "DATA":
-            return parse_element_bag("DATA", index, pointcloud, child)
-        case "CHILDREN":
-            return parse_collection("CHILDREN", index, pointcloud, child)
-        case "REFERENCE_GEOMETRY":
-            return parse_reference_geometry(index, pointcloud, child)
-        case "GEOMETRY":
-            return parse_geometry(index, pointcloud, child)
-        case "MODIFIER":
-            return parse_element_bag("MODIFIER", index, pointcloud, child)
-        case "CONSTRAINT":
-            return parse_element_bag("CONSTRAINT", index, pointcloud, child)
-        case "DEPENDENCIES":
-            return parse_collection("DEPENDENCIES", index, pointcloud, child)
-        case "FALLOFF":
-            return parse_element_bag("FALLOFF", index, pointcloud, child)
-        case "MATERIALS":
-            return parse_collection("MATERIALS", index, pointcloud, child)
-        case "CONSTRAINTS":
-            return parse_collection("CONSTRAINTS", index, pointcloud, child)
-        case "MODIFIERS":
-            return parse_collection("MODIFIERS", index, pointcloud, child)
-        case "VERTEX_GROUPS":
-            return parse_collection("VERTEX_GROUPS", index, pointcloud, child)
-        case "VERTEX_GROUP":
-            return parse_element_bag("VERTEX_GROUP", index, pointcloud, child)
-        case "ATTRIBUTES":
-            return parse_attributes(index, pointcloud, child)
-        case "SELECTION":
-            return parse_selection(index, pointcloud, child)
-        case "NAME":
-            return parse_name(child)
-        case "TARGET":
-            return parse_element_bag("TARGET", index, pointcloud, child)
-        case "DEPENDENCY":
-            return parse_element_bag("DEPENDENCY", index, pointcloud, child)
-        case "TARGET_SPACE":
-            return parse_element_bag("TARGET_SPACE", index, pointcloud, child)
-        case "OWNER_SPACE":
-            return parse_element_bag("OWNER_SPACE", index, pointcloud, child)
-        case "TARGET_VALUE":
-            return parse_element_bag("TARGET_VALUE", index, pointcloud, child)
-        case "SUBTARGET_VALUE":
-            return parse_element_bag("SUBTARGET_VALUE", index, pointcloud, child)
-    return {
-        "status": "ERROR",
-        "message": f"UNKNOWN TYPE {type_name}, {type_id}",
-        "path": [],
+class DataRecord(ElementRecord):
+    __slots__ = ("geometry", "vertex_groups", "materials")
+
+    element_slots = {
+        "GEOMETRY": "geometry",
+        "VERTEX_GROUPS": "vertex_groups",
+        "MATERIALS": "materials",
     }
 
 
-def parse_geometry(index, parent_pointcloud, child):
-    subtypes = parent_pointcloud.attributes["subtype"]
-    if subtypes is None:
-        return {
-            "status": "ERROR",
-            "message": "Geometry is missing subtype value",
-            "path": ["geometry"],
-        }
-
-    subtype_value = get_attribute_value(subtypes, subtypes.data[index])
-    subtype = data_block_type_ids[subtype_value]
-    match subtype:
-        case "ARMATURE":
-            armature_result = parse_element_bag(
-                "GEOMETRY", index, parent_pointcloud, child
-            )
-            if armature_result["status"] == "ERROR":
-                return concat_error_path(armature_result, "geometry")
-            value = armature_result["value"]
-            return {
-                "status": "OK",
-                "type": "GEOMETRY",
-                "subtype": "ARMATURE",
-                "value": {"subtype": subtype, "value": value},
-            }
-        case "CURVE":
-            if child.curves is not None:
-                return {
-                    "status": "OK",
-                    "type": "GEOMETRY",
-                    "subtype": "CURVE",
-                    "value": {"subtype": subtype, "value": child.curves.copy()},
-                }
-        case "GREASEPENCIL":
-            if child.grease_pencil is not None:
-                return {
-                    "status": "OK",
-                    "type": "GEOMETRY",
-                    "subtype": "GREASEPENCIL",
-                    "value": {"subtype": subtype, "value": child.grease_pencil.copy()},
-                }
-        case "MESH":
-            if child.mesh is not None:
-                return {
-                    "status": "OK",
-                    "type": "GEOMETRY",
-                    "subtype": "MESH",
-                    "value": {"subtype": subtype, "value": child.mesh.copy()},
-                }
-        case "POINTCLOUD":
-            if child.pointcloud is not None:
-                return {
-                    "status": "OK",
-                    "type": "GEOMETRY",
-                    "subtype": "POINTCLOUD",
-                    "value": {"subtype": subtype, "value": child.pointcloud.copy()},
-                }
-        case "VOLUME":
-            if child.volume is not None:
-                return {
-                    "status": "OK",
-                    "type": "GEOMETRY",
-                    "subtype": "VOLUME",
-                    "value": {"subtype": subtype, "value": child.volume.copy()},
-                }
-        case "INSTANCE":
-            instance_references = child.instance_references()
-            instances_pointcloud = child.instances_pointcloud()
-            if instance_references is not None and instances_pointcloud is not None:
-                return {
-                    "status": "OK",
-                    "value": {
-                        "type": "GEOMETRY",
-                        "subtype": "INSTANCE",
-                        "value": {
-                            "subtype": subtype,
-                            "pointcloud": instances_pointcloud.copy(),
-                            "references": instance_references.copy(),
-                        },
-                    },
-                }
-    return {
-        "status": "ERROR",
-        "message": "Missing expected geometry data",
-        "path": ["geometry"],
-    }
+class ArmatureRecord(ElementRecord):
+    """The GEOMETRY of an armature: its root bones"""
 
+    __slots__ = ("children", "bone")
 
-def parse_data(index, parent_pointcloud, child):
-    pointcloud = child.instances_pointcloud()
-    instance_references = child.instance_references()
-    if pointcloud is None or instance_references is None:
-        return {"status": "ERROR", "message": "Malformed data", "path": ["data"]}
-    reference_indices = pointcloud.attributes[".reference_index"]
-    attributes_result = parse_attributes(index, parent_pointcloud, child)
-    if attributes_result["status"] == "ERROR":
-        return concat_error_path(attributes_result, "bone")
-    value = {}
-    concat_to_values(attributes_result, value)
-    for i in reference_indices.data:
-        child = instance_references[i.value]
-        element_result = parse_element(i.value, pointcloud, child)
-        if element_result["status"] == "ERROR":
-            return concat_error_path(element_result, child.name)
-        concat_to_values(element_result, value)
-        value["type"] = "DATA"
-    return {"status": "OK", "value": value}
-
-
-def concat_to_values(element_result, values):
-    if element_result["type"] == "ATTRIBUTES":
-        for k, v in element_result["value"].items():
-            values[k] = v
-    else:
-        values[element_result["type"]] = element_result["value"]
-
-
-def parse_object(index, parent_pointcloud, child):
-    pointcloud = child.instances_pointcloud()
-    instance_references: list = child.instance_references()
-    if pointcloud is None or instance_references is None:
-        return {"status": "ERROR", "message": "Malformed data", "path": []}
-    reference_indices = pointcloud.attributes[".reference_index"]
-    value = {}
-    attributes_result = parse_attributes(index, parent_pointcloud, child)
-    concat_to_values(attributes_result, value)
-    for i in reference_indices.data:
-        child = instance_references[i.value]
-        element_result = parse_element(i.value, pointcloud, child)
-        if element_result["status"] == "ERROR":
-            return concat_error_path(element_result, child.name)
-
-        concat_to_values(element_result, value)
-
-    return {
-        "status": "OK",
-        "type": "OBJECT",
-        "value": value,
-    }
+    element_slots = {"CHILDREN": "children", "BONE": "bone"}
+
+
+class BoneRecord(ElementRecord):
+    __slots__ = ("children",)
+
+    element_slots = {"CHILDREN": "children"}
+
+
+class ModifierRecord(ElementRecord):
+    __slots__ = ("target", "selection")
+
+    element_slots = {"TARGET": "target", "SELECTION": "selection"}
 
 
-def parse_reference_geometry(index, parent_pointcloud, child):
-    geometry_result = parse_geometry(index, parent_pointcloud, child)
-    if geometry_result["status"] == "ERROR":
-        return concat_error_path(geometry_result, "reference_geometry")
-    return {
-        "status": "OK",
-        "type": "REFERENCE_GEOMETRY",
-        "subtype": geometry_result["subtype"],
-        "value": geometry_result["value"],
+class ConstraintRecord(ElementRecord):
+    __slots__ = ("target", "owner_space", "target_space")
+
+    element_slots = {
+        "TARGET": "target",
+        "OWNER_SPACE": "owner_space",
+        "TARGET_SPACE": "target_space",
     }
 
 
-def parse_objects(parent):
-    pointcloud = parent.instances_pointcloud()
-    instance_references: list = parent.instance_references()
-    if pointcloud is None or instance_references is None:
-        return {"status": "ERROR", "message": "Malformed data", "path": []}
-    reference_indices = pointcloud.attributes[".reference_index"]
-    values = []
-    for i in reference_indices.data:
-        child = instance_references[i.value]
-        object_result = parse_object(i.value, pointcloud, child)
-        if object_result["status"] == "ERROR":
-            return concat_error_path(object_result, child.name)
+class TargetRecord(ElementRecord):
+    __slots__ = ("value", "subtarget")
+
+    element_slots = {"TARGET_VALUE": "value", "SUBTARGET_VALUE": "subtarget"}
+
+
+class VertexGroupRecord(ElementRecord):
+    __slots__ = ("selection",)
+
+    element_slots = {"SELECTION": "selection"}
+
+
+class SelectionRecord(ElementRecord):
+    __slots__ = ("indices",)
+
+    def __init__(self, type_id, subtype_id=None, attributes=no_values):
+        super().__init__(type_id, subtype_id, attributes)
+        self.indices = None
+
+    def content(self):
+        return (self.name, self.attributes, self.elements, self.indices)
+
+
+class ParseFrame:
+    """An element whose children are still being parsed.
+
+    key is the type name the finished element is stored under in its parent,
+    value the record being filled or, for collections, the list of children."""
+
+    __slots__ = (
+        "key",
+        "value",
+        "table",
+        "pending",
+        "parent",
+        "name",
+        "labels",
+        "child_decoder",
+        "finishers",
+    )
+
+    def __init__(self, key, value, table, parent, name):
+        self.key = key
+        self.value = value
+        self.table = table
+        self.pending = enumerate(table.reference_indices)
+        self.parent = parent
+        self.name = name
+        self.labels = []
+        self.child_decoder = None
+        self.finishers = []
+
+    def path_segment(self):
+        segment = self.labels if len(self.name) == 0 else [self.name, *self.labels]
+        return segment
+
+    def add(self, key, value):
+        record = self.value
+        if type(record) is list:
+            record.append(value)
+        elif key == "NAME":
+            record.name = value
+        elif key == "ATTRIBUTES":
+            if record.attributes is no_values:
+                record.attributes = {}
+            record.attributes.update(value)
+        else:
+            slot = record.element_slots.get(key)
+            if slot is not None:
+                setattr(record, slot, value)
+                return
+            if record.elements is no_values:
+                record.elements = {}
+            record.elements[key] = value
+
+    def finish(self):
+        value = self.value
+        for finisher in self.finishers:
+            finisher(value)
+        return value
+
+
+def iter_frames(parse_context, root):
+    """Parses the hierarchy below root with an explicit stack, so nesting depth
+    is not bound by the interpreter's recursion limit. Yields (type name, value)
+    for every direct child of root as soon as it is complete."""
+    stack = [root]
+    while True:
+        frame = stack[-1]
+        pending = next(frame.pending, None)
+        if pending is not None:
+            # Ids and attributes are read from the instance's own row, the
+            # reference index only picks the geometry it instances
+            row, reference_index = pending
+            table = frame.table
+            if not 0 <= reference_index < len(table.references):
+                error = ParseError(f"Reference index {reference_index} out of range")
+                raise error.located(frame, f"instance {row}")
+            child = table.references[reference_index]
+            decoder = frame.child_decoder
+            if decoder is None:
+                decoder = element_decoders.get(table.type_ids[row])
+            try:
+                if decoder is None:
+                    raise ParseError(f"UNKNOWN TYPE {table.type_ids[row]}")
+                value = decoder.handler(
+                    parse_context, decoder, row, table, child, frame
+                )
+            except ParseError as error:
+                raise error.located(frame, child.name)
+            if type(value) is ParseFrame:
+                stack.append(value)
+            elif frame is root:
+                yield decoder.type_name, value
+            else:
+                frame.add(decoder.type_name, value)
+            continue
+        stack.pop()
+        if frame is root:
+            return
+        value = frame.finish()
+        if stack[-1] is root:
+            yield frame.key, value
+        else:
+            stack[-1].add(frame.key, value)
+
+
+def parse_attributes(parse_context, index, parent_table, columns=None):
+    values = {}
+    for [attribute_name, data_type, column] in parent_table.project(columns):
+        values[attribute_name] = get_column_value(data_type, column, index)
+    return values
+
+
+def parse_attributes_element(
+    parse_context, decoder, index, parent_table, child, parent_frame
+):
+    columns = parse_context.get_columns(decoder)
+    return parse_attributes(parse_context, index, parent_table, columns)
 
-        values.append(object_result["value"])
 
-    return {"status": "OK", "type": "OBJECTS", "value": values}
+def parse_name(parse_context, decoder, index, parent_table, child, parent_frame):
+    return child.name
+
+
+def parse_element_bag(parse_context, decoder, index, parent_table, child, parent_frame):
+    subtype_id = None
+    if decoder.subtypes is not None:
+        if parent_table.subtype_ids is None:
+            raise ParseError(
+                f"{decoder.type_name.capitalize()} is missing subtype value"
+            )
+        subtype_id = parent_table.subtype_ids[index]
+        if subtype_id not in decoder.subtypes:
+            raise ParseError(f"Unknown {decoder.type_name.lower()} subtype {subtype_id}")
+    columns = parse_context.get_columns(decoder)
+    attributes = parse_attributes(parse_context, index, parent_table, columns)
+    record = decoder.record_type(decoder.type_id, subtype_id, attributes or no_values)
+    table = parse_context.get_table(child)
+    if table is None:
+        return record
+    return ParseFrame(decoder.type_name, record, table, parent_frame, child.name)
+
+
+def parse_collection(parse_context, decoder, index, parent_table, child, parent_frame):
+    table = parse_context.get_table(child)
+    if table is None:
+        return []
+    return ParseFrame(decoder.type_name, [], table, parent_frame, child.name)
+
+
+def read_selection_indices(mesh):
+    """Reads the index attribute of a selection mesh as one int32 array"""
+    column = read_attribute_column(mesh.attributes["index"])
+    return np.asarray(column, dtype=np.int32).reshape(-1)
+
+
+def finish_selection(mesh):
+    def finish(record):
+        record.indices = read_selection_indices(mesh)
+
+    return finish
+
+
+def parse_selection(parse_context, decoder, index, parent_table, child, parent_frame):
+    mesh = child.mesh
+    if mesh is None or "index" not in mesh.attributes:
+        raise ParseError("Expected indices", ["selection"])
+    bag = parse_element_bag(
+        parse_context, decoder, index, parent_table, child, parent_frame
+    )
+    finish = finish_selection(mesh)
+    if type(bag) is ParseFrame:
+        bag.labels.insert(0, "selection")
+        bag.finishers.append(finish)
+        return bag
+    finish(bag)
+    return bag
+
+
+class ElementDecoder:
+    """Decodes the elements of one type id.
+
+    handler is called as handler(parse_context, decoder, index, parent_table,
+    child, parent_frame) and returns either the parsed value or a ParseFrame
+    whose children still have to be parsed. subtypes maps subtype ids to names,
+    columns is the frozenset of attribute columns the element reads, None for
+    all, and record_type is the record class bags of this type are parsed
+    into."""
+
+    __slots__ = ("type_id", "type_name", "handler", "subtypes", "columns", "record_type")
+
+    def __init__(
+        self,
+        type_id,
+        type_name,
+        handler,
+        subtypes=None,
+        columns=None,
+        record_type=ElementRecord,
+    ):
+        self.type_id = type_id
+        self.type_name = type_name
+        self.handler = handler
+        self.subtypes = subtypes
+        self.columns = columns
+        self.record_type = record_type
+
+
+element_decoders = {}
+element_decoders_by_name = {}
+
+
+def register_element_decoder(
+    type_id, type_name, handler, subtypes=None, columns=None, record_type=ElementRecord
+):
+    """Registers how elements with the given type id are parsed. subtypes
+    defaults to the table in subtype_type_ids for the type name."""
+    if subtypes is None:
+        subtypes = subtype_type_ids.get(type_name)
+    decoder = ElementDecoder(
+        type_id, type_name, handler, subtypes, columns, record_type
+    )
+    type_ids[type_id] = type_name
+    element_decoders[type_id] = decoder
+    element_decoders_by_name[type_name] = decoder
+    return decoder
+
+
+# The GeometrySet component holding each data-block geometry subtype
+geometry_components = {
+    "CURVE": "curves",
+    "GREASEPENCIL": "grease_pencil",
+    "MESH": "mesh",
+    "POINTCLOUD": "pointcloud",
+    "VOLUME": "volume",
+}
+
+
+class GeometryRef:
+    """A geometry component of the evaluated geometry set.
+
+    The component is only copied into a new data-block when realize() is
+    called, so parses that fail or are discarded never duplicate geometry.
+    The evaluated geometry set must still be alive when the ref is realized,
+    i.e. it has to happen before the depsgraph is evaluated again. Instance
+    refs are never realized, their instances are read from component()."""
+
+    __slots__ = ("type_id", "subtype", "geometry", "data_block")
+
+    def __init__(self, type_id, subtype, geometry):
+        self.type_id = type_id
+        self.subtype = subtype
+        self.geometry = geometry
+        self.data_block = None
+
+    def component(self):
+        if self.subtype == "INSTANCE":
+            return self.geometry
+        return getattr(self.geometry, geometry_components[self.subtype])
+
+    def realize(self):
+        if self.data_block is None:
+            self.data_block = self.component().copy()
+        return self.data_block
+
+    def release(self):
+        """Drops the evaluated geometry and the copy once they are no longer
+        needed, e.g. after the copy was attached to an object"""
+        self.geometry = None
+        self.data_block = None
+
+
+def parse_geometry(parse_context, decoder, index, parent_table, child, parent_frame):
+    if parent_table.subtype_ids is None:
+        raise ParseError("Geometry is missing subtype value", ["geometry"])
+
+    subtype_id = parent_table.subtype_ids[index]
+    if subtype_id not in data_block_type_ids:
+        raise ParseError(f"Unknown geometry subtype {subtype_id}", ["geometry"])
+    subtype = data_block_type_ids[subtype_id]
+    if subtype == "ARMATURE":
+        armature = parse_element_bag(
+            parse_context,
+            element_decoders_by_name["GEOMETRY"],
+            index,
+            parent_table,
+            child,
+            parent_frame,
+        )
+        if type(armature) is ParseFrame:
+            armature.labels.append("geometry")
+        return armature
+    if subtype == "INSTANCE":
+        present = parse_context.get_table(child) is not None
+    else:
+        present = getattr(child, geometry_components[subtype]) is not None
+    if not present:
+        raise ParseError("Missing expected geometry data", ["geometry"])
+    return GeometryRef(decoder.type_id, subtype, child)
+
+
+def parse_object(parse_context, decoder, index, parent_table, child, parent_frame):
+    table = parse_context.get_table(child)
+    if table is None:
+        raise ParseError("Malformed data")
+    columns = parse_context.get_columns(decoder)
+    attributes = parse_attributes(parse_context, index, parent_table, columns)
+    record = ObjectRecord(decoder.type_id, None, attributes or no_values)
+    return ParseFrame("OBJECT", record, table, parent_frame, child.name)
+
+
+def parse_reference_geometry(
+    parse_context, decoder, index, parent_table, child, parent_frame
+):
+    try:
+        geometry = parse_geometry(
+            parse_context, decoder, index, parent_table, child, parent_frame
+        )
+    except ParseError as error:
+        error.path.insert(0, "reference_geometry")
+        raise error
+    if type(geometry) is ParseFrame:
+        geometry.key = decoder.type_name
+        geometry.labels.insert(0, "reference_geometry")
+        geometry.value.type_id = decoder.type_id
+    elif type(geometry) is not GeometryRef:
+        geometry.type_id = decoder.type_id
+    return geometry
+
+
+def iter_objects(parent, passthrough=(), id_tables=None):
+    """Parses the objects instanced by the evaluated geometry of a materialize
+    root, yielding each ObjectRecord as soon as it is decoded. Instance tables
+    are only cached while an object is being parsed, so memory is bound by
+    the largest object rather than the whole hierarchy. Elements of the type
+    names in passthrough keep attributes outside their schema. id_tables, as
+    filled by validate_geometry, saves reading the id columns again. Raises
+    ParseError on malformed input."""
+    with ParseContext(passthrough, id_tables) as parse_context:
+        table = parse_context.get_table(parent)
+        if table is None:
+            raise ParseError("Malformed data")
+        frame = ParseFrame("OBJECTS", [], table, None, "")
+        frame.child_decoder = element_decoders_by_name["OBJECT"]
+        for _, record in iter_frames(parse_context, frame):
+            parse_context.release()
+            yield record
+
+
+def parse_objects(parent, passthrough=(), id_tables=None):
+    """Parses all objects of a materialize root into a list of ObjectRecords"""
+    return list(iter_objects(parent, passthrough, id_tables))
+
+
+element_handlers = {
+    "OBJECT": (parse_object, ObjectRecord),
+    "BONE": (parse_element_bag, BoneRecord),
+    "DATA": (parse_element_bag, DataRecord),
+    "CHILDREN": (parse_collection, ElementRecord),
+    "REFERENCE_GEOMETRY": (parse_reference_geometry, ArmatureRecord),
+    "GEOMETRY": (parse_geometry, ArmatureRecord),
+    "MODIFIER": (parse_element_bag, ModifierRecord),
+    "CONSTRAINT": (parse_element_bag, ConstraintRecord),
+    "DEPENDENCIES": (parse_collection, ElementRecord),
+    "FALLOFF": (parse_element_bag, ElementRecord),
+    "MATERIALS": (parse_collection, ElementRecord),
+    "CONSTRAINTS": (parse_collection, ElementRecord),
+    "MODIFIERS": (parse_collection, ElementRecord),
+    "VERTEX_GROUPS": (parse_collection, ElementRecord),
+    "ATTRIBUTES": (parse_attributes_element, ElementRecord),
+    "SELECTION": (parse_selection, SelectionRecord),
+    "NAME": (parse_name, ElementRecord),
+    "TARGET": (parse_element_bag, TargetRecord),
+    "DEPENDENCY": (parse_element_bag, ElementRecord),
+    "TARGET_SPACE": (parse_element_bag, ElementRecord),
+    "OWNER_SPACE": (parse_element_bag, ElementRecord),
+    "VERTEX_GROUP": (parse_element_bag, VertexGroupRecord),
+    "TARGET_VALUE": (parse_element_bag, ElementRecord),
+    "SUBTARGET_VALUE": (parse_element_bag, ElementRecord),
+}
+
+# The attributes each element type reads from the instances it is part of.
+# Anything else on those instances is skipped unless the type is passed
+# through. ATTRIBUTES elements hold custom attributes and read everything.
+attribute_schemas = {
+    "OBJECT": frozenset({"parent", "location", "rotation", "scale"}),
+    "BONE": frozenset({"head", "tail", "roll", "parent"}),
+    "DATA": frozenset(),
+    "REFERENCE_GEOMETRY": frozenset(),
+    "GEOMETRY": frozenset(),
+    "MODIFIER": frozenset({"strength"}),
+    "CONSTRAINT": frozenset({"influence"}),
+    "FALLOFF": frozenset({"radius"}),
+    "SELECTION": frozenset(),
+    "TARGET": frozenset(),
+    "DEPENDENCY": frozenset(),
+    "TARGET_SPACE": frozenset(),
+    "OWNER_SPACE": frozenset(),
+    "VERTEX_GROUP": frozenset(),
+    "TARGET_VALUE": frozenset(),
+    "SUBTARGET_VALUE": frozenset(),
+}
+
+for type_id, type_name in list(type_ids.items()):
+    handler, record_type = element_handlers[type_name]
+    register_element_decoder(
+        type_id,
+        type_name,
+        handler,
+        columns=attribute_schemas.get(type_name),
+        record_type=record_type,
+    )
@@ -0,0 +1,205 @@
+import bpy
+import json
+import sys
+import time
+from contextlib import contextmanager
+from .parsing import type_ids
+from .utils import StageTimer
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is not reported there
+    resource = None
+
+# Bytes per element Blender stores for each attribute data type
+attribute_sizes = {
+    "FLOAT": 4,
+    "INT": 4,
+    "INT8": 1,
+    "BOOLEAN": 1,
+    "FLOAT_VECTOR": 12,
+    "FLOAT2": 8,
+    "INT16_2D": 4,
+    "INT32_2D": 8,
+    "FLOAT_COLOR": 16,
+    "BYTE_COLOR": 4,
+    "QUATERNION": 16,
+    "FLOAT4X4": 64,
+}
+
+
+def get_peak_memory():
+    """Peak resident memory of the process in bytes, or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_data_block_bytes(data_block):
+    """Size of the attribute arrays of a data-block and of the drawings of a
+    grease pencil, strings not included. Volume grids are not counted, their
+    size is not readable from Python."""
+    total = 0
+    for attribute in getattr(data_block, "attributes", ()):
+        total += len(attribute.data) * attribute_sizes.get(attribute.data_type, 0)
+    for layer in getattr(data_block, "layers", ()):
+        for frame in layer.frames:
+            if frame.drawing is not None:
+                total += get_data_block_bytes(frame.drawing)
+    return total
+
+
+def format_bytes(count):
+    if count < 1024 * 1024:
+        return f"{count / 1024:.1f} KiB"
+    return f"{count / (1024 * 1024):.1f} MiB"
+
+
+class Profiler(StageTimer):
+    """A StageTimer that also keeps every span for a trace, the elements below
+    the root by type, the bytes written into data-blocks by geometry subtype
+    and the peak memory of the process. Only used when profiling is enabled,
+    otherwise materialize runs with a plain StageTimer."""
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.spans = []
+        self.element_counts = {}
+        self.bytes_copied = {}
+        self.peak_memory_before = get_peak_memory()
+        self.peak_memory = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.stages[name] = self.stages.get(name, 0.0) + end - start
+            self.spans.append((name, start, end))
+
+    def count_elements(self, type_id_counts):
+        for type_id, count in type_id_counts.items():
+            type_name = type_ids.get(type_id, "UNKNOWN")
+            self.element_counts[type_name] = (
+                self.element_counts.get(type_name, 0) + count
+            )
+
+    def count_bytes(self, subtype, data_block):
+        self.bytes_copied[subtype] = self.bytes_copied.get(
+            subtype, 0
+        ) + get_data_block_bytes(data_block)
+
+    def finish(self):
+        self.peak_memory = get_peak_memory()
+
+    def report_lines(self):
+        lines = [self.format()]
+        if len(self.element_counts) > 0:
+            lines.append(
+                "Elements: "
+                + ", ".join(
+                    f"{name.lower()} {count}"
+                    for name, count in sorted(self.element_counts.items())
+                )
+            )
+        if len(self.bytes_copied) > 0:
+            lines.append(
+                "Copied: "
+                + ", ".join(
+                    f"{subtype.lower()} {format_bytes(count)}"
+                    for subtype, count in sorted(self.bytes_copied.items())
+                )
+            )
+        if self.peak_memory is not None:
+            growth = self.peak_memory - self.peak_memory_before
+            lines.append(
+                f"Peak memory: {format_bytes(self.peak_memory)}"
+                f" (+{format_bytes(growth)} during this run)"
+            )
+        return lines
+
+    def trace_events(self, tid=0):
+        """The spans as complete events of the Chrome trace event format"""
+        return [
+            {
+                "name": name,
+                "cat": "materialize",
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 0,
+                "tid": tid,
+                "args": {"root": self.name},
+            }
+            for name, start, end in self.spans
+        ]
+
+
+def write_trace(path, profilers):
+    """Writes the spans of profilers, one thread each, as a Chrome trace
+    event file that chrome://tracing or Perfetto can open"""
+    events = []
+    for tid, profiler in enumerate(profilers):
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 0,
+                "tid": tid,
+                "args": {"name": profiler.name},
+            }
+        )
+        events.extend(profiler.trace_events(tid))
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# Report lines of the last profiled run of each root, by root name
+last_reports = {}
+
+
+def finish_profiling(scene, profilers):
+    """Keeps the reports for the modifier panel and writes the trace file if
+    the scene asks for one"""
+    for profiler in profilers:
+        profiler.finish()
+        last_reports[profiler.name] = profiler.report_lines()
+    trace_path = scene.mtlz_trace_path
+    if trace_path and len(profilers) > 0:
+        write_trace(bpy.path.abspath(trace_path), profilers)
+
+
+def draw_report(layout, obj):
+    lines = last_reports.get(obj.name)
+    if lines is None:
+        return
+    box = layout.box()
+    for line in lines:
+        box.label(text=line)
+
+
+def register():
+    bpy.types.Scene.mtlz_profile = bpy.props.BoolProperty(
+        name="Profile",
+        description=(
+            "Collect timings, element counts and memory use while materializing"
+        ),
+        default=False,
+    )
+    bpy.types.Scene.mtlz_trace_path = bpy.props.StringProperty(
+        name="Trace File",
+        description="Chrome trace event file profiled runs are written to",
+        subtype="FILE_PATH",
+    )
+
+
+def unregister():
+    last_reports.clear()
+    del bpy.types.Scene.mtlz_profile
+    del bpy.types.Scene.mtlz_trace_path
@@ -0,0 +1,295 @@
+import numpy as np
+
+modifier_types = {"HOOK": "HOOK", "ARMATURE": "ARMATURE"}
+
+constraint_types = {
+    "TRANSFORM": "COPY_TRANSFORMS",
+    "LOCATION": "COPY_LOCATION",
+    "ROTATION": "COPY_ROTATION",
+    "SCALE": "COPY_SCALE",
+}
+
+
+# Properties that point an item at its target, binding happens again when
+# they change
+target_properties = ("object", "subtarget")
+
+
+class StackItem:
+    """A modifier or constraint as it should end up on the object. properties
+    are written with setattr, vertex_indices only applies to hooks. bind, if
+    set, is queued with the item once it is created or its target changes,
+    see write_properties."""
+
+    __slots__ = ("name", "type", "properties", "vertex_indices", "bind")
+
+    def __init__(self, name, type, properties, vertex_indices=None, bind=None):
+        self.name = name
+        self.type = type
+        self.properties = properties
+        self.vertex_indices = vertex_indices
+        self.bind = bind
+
+
+def get_target(record, resolver):
+    target = record.target
+    if target is None:
+        return None, ""
+    obj = None
+    if target.value is not None and target.value.name is not None:
+        obj = resolver.get("OBJECT", target.value.name)
+    subtarget = ""
+    if target.subtarget is not None and target.subtarget.name is not None:
+        subtarget = target.subtarget.name
+        if obj is not None and obj.type == "ARMATURE":
+            if not resolver.has_bone(obj, subtarget):
+                raise ValueError(f"Bone {subtarget} not found in {obj.name}")
+    return obj, subtarget
+
+
+def bind_hook(hook):
+    """Makes where the target is now the rest position of hook, as its Reset
+    and Recenter buttons do, so the vertices only move once the target does.
+    Reads evaluated world matrices, the view layer has to be updated after
+    the target and owner were created or moved."""
+    target = hook.object
+    if target is None:
+        return
+    owner = hook.id_data
+    matrix = target.matrix_world
+    if hook.subtarget and target.type == "ARMATURE":
+        bone = target.pose.bones.get(hook.subtarget)
+        if bone is not None:
+            matrix = matrix @ bone.matrix
+    hook.matrix_inverse = matrix.inverted_safe() @ owner.matrix_world
+    hook.center = owner.matrix_world.inverted_safe() @ matrix.translation
+
+
+def unique_names(names):
+    """Blender keeps item names unique within a stack, so duplicates get the
+    suffix Blender would give them"""
+    seen = set()
+    result = []
+    for name in names:
+        unique = name
+        suffix = 0
+        while unique in seen:
+            suffix += 1
+            unique = f"{name}.{suffix:03d}"
+        seen.add(unique)
+        result.append(unique)
+    return result
+
+
+def get_modifier_items(records, resolver):
+    items = []
+    names = unique_names(
+        [record.name or record.subtype.title() for record in records]
+    )
+    for record, name in zip(records, names):
+        target, subtarget = get_target(record, resolver)
+        properties = {"object": target}
+        vertex_indices = None
+        bind = None
+        if record.subtype == "HOOK":
+            bind = bind_hook
+            properties["subtarget"] = subtarget
+            properties["strength"] = record.attributes.get("strength", 1.0)
+            falloff = record.get("FALLOFF")
+            if falloff is None:
+                properties["falloff_type"] = "NONE"
+            else:
+                properties["falloff_type"] = "SMOOTH"
+                properties["falloff_radius"] = falloff.attributes.get("radius", 0.0)
+            if record.selection is not None:
+                # Sorted and without duplicates, as vertex_indices_set stores
+                # them, so unchanged hooks compare equal
+                vertex_indices = np.unique(record.selection.indices).tolist()
+        items.append(
+            StackItem(
+                name, modifier_types[record.subtype], properties, vertex_indices, bind
+            )
+        )
+    return items
+
+
+def get_constraint_items(records, resolver):
+    items = []
+    names = unique_names(
+        [record.name or record.subtype.title() for record in records]
+    )
+    for record, name in zip(records, names):
+        target, subtarget = get_target(record, resolver)
+        attributes = record.attributes
+        properties = {
+            "target": target,
+            "subtarget": subtarget,
+            "influence": attributes.get("influence", 1.0),
+        }
+        for space in ("owner_space", "target_space"):
+            space_record = getattr(record, space)
+            if space_record is not None:
+                properties[space] = space_record.subtype
+        items.append(StackItem(name, constraint_types[record.subtype], properties))
+    return items
+
+
+def longest_increasing_run(values):
+    """Indices of a longest strictly increasing subsequence of values"""
+    tails = []
+    tail_indices = []
+    previous = [-1] * len(values)
+    for index, value in enumerate(values):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if tails[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low > 0:
+            previous[index] = tail_indices[low - 1]
+        if low == len(tails):
+            tails.append(value)
+            tail_indices.append(index)
+        else:
+            tails[low] = value
+            tail_indices[low] = index
+    result = []
+    index = tail_indices[-1] if len(tail_indices) > 0 else -1
+    while index >= 0:
+        result.append(index)
+        index = previous[index]
+    result.reverse()
+    return result
+
+
+def reorder_stack(stack, names):
+    """Moves the items named in names into that order with as few moves as
+    possible: the longest run already in order stays where it is. Items not
+    in names keep their positions relative to each other."""
+    order = [item.name for item in stack]
+    ranks = {name: rank for rank, name in enumerate(names)}
+    managed = [name for name in order if name in ranks]
+    if managed == names:
+        return 0
+    kept = {managed[i] for i in longest_increasing_run([ranks[n] for n in managed])}
+    moves = 0
+    for rank, name in enumerate(names):
+        if name in kept:
+            continue
+        from_index = order.index(name)
+        order.pop(from_index)
+        if rank == 0:
+            to_index = min(
+                (order.index(other) for other in names[1:] if other in order),
+                default=from_index,
+            )
+        else:
+            to_index = order.index(names[rank - 1]) + 1
+        order.insert(to_index, name)
+        if from_index != to_index:
+            stack.move(from_index, to_index)
+            moves += 1
+    return moves
+
+
+def write_properties(target, item, binds, created=False):
+    """Writes only the properties that differ, so unchanged items do not tag
+    anything for re-evaluation. Items that need binding are added to binds as
+    (bind, target) pairs."""
+    writes = 0
+    retargeted = created
+    for key, value in item.properties.items():
+        if getattr(target, key) != value:
+            setattr(target, key, value)
+            writes += 1
+            retargeted = retargeted or key in target_properties
+    if item.vertex_indices is not None:
+        if list(target.vertex_indices) != item.vertex_indices:
+            target.vertex_indices_set(item.vertex_indices)
+            writes += 1
+    if item.bind is not None and retargeted:
+        binds.append((item.bind, target))
+        writes += 1
+    return writes
+
+
+def new_modifier(stack, item):
+    return stack.new(name=item.name, type=item.type)
+
+
+def new_constraint(stack, item):
+    constraint = stack.new(item.type)
+    constraint.name = item.name
+    return constraint
+
+
+def reconcile_stack(stack, managed_names, items, new_item, binds):
+    """Brings the items of stack created by materialize in line with items by
+    removing, adding, reordering and updating only what differs. Items a user
+    added are left alone. Items that need binding are added to binds. Returns
+    the names of the managed items and the number of operations done."""
+    existing = {}
+    for current in stack:
+        if current.name in managed_names:
+            existing[current.name] = current
+    types = {item.name: item.type for item in items}
+    operations = 0
+    for name, current in list(existing.items()):
+        if types.get(name) != current.type:
+            stack.remove(current)
+            del existing[name]
+            operations += 1
+    names = []
+    created = set()
+    for item in items:
+        current = existing.get(item.name)
+        if current is None:
+            current = new_item(stack, item)
+            existing[current.name] = current
+            created.add(current.name)
+            operations += 1
+        item.name = current.name
+        names.append(current.name)
+    operations += reorder_stack(stack, names)
+    for item in items:
+        operations += write_properties(
+            existing[item.name], item, binds, item.name in created
+        )
+    return names, operations
+
+
+def apply_stacks(obj, modifiers, constraints, resolver, binds):
+    """Reconciles the modifier and constraint stacks of obj with its parsed
+    MODIFIERS and CONSTRAINTS. Targets are looked up by name with resolver.
+    Hooks to bind are added to binds as (bind, target) pairs, to be bound
+    once the view layer is updated. Returns the number of operations done."""
+    operations = 0
+    stacks = (
+        (
+            "materialize_modifiers",
+            obj.modifiers,
+            modifiers,
+            get_modifier_items,
+            new_modifier,
+        ),
+        (
+            "materialize_constraints",
+            obj.constraints,
+            constraints,
+            get_constraint_items,
+            new_constraint,
+        ),
+    )
+    for [key, stack, records, get_items, new_item] in stacks:
+        managed_names = set(obj.get(key, ()))
+        if len(managed_names) == 0 and not records:
+            continue
+        items = get_items(records or [], resolver)
+        names, stack_operations = reconcile_stack(
+            stack, managed_names, items, new_item, binds
+        )
+        obj[key] = names
+        operations += stack_operations
+    return operations
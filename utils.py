@@ -1,4 +1,6 @@
 import bpy
+import time
+from contextlib import contextmanager
 
 
 def is_materialize_child(obj):
@@ -7,6 +9,21 @@ def is_materialize_child(obj):
     return False
 
 
+# The node group the last modifier of every materialize root uses, linked from
+# the add-on's library
+prepare_group_name = "Prepare Materialization"
+prepare_group_library = "materialize.blend"
+
+
+def is_prepare_group(node_group):
+    return (
+        node_group is not None
+        and node_group.name == prepare_group_name
+        and node_group.library is not None
+        and node_group.library.name == prepare_group_library
+    )
+
+
 def is_materialize_modifier(obj):
     index = len(obj.modifiers) - 1
     if "materialize" in obj:
@@ -14,13 +31,53 @@ def is_materialize_modifier(obj):
     if index < 0:
         return False
     modifier = obj.modifiers[index]
-    if modifier.type != "NODES":
+    if modifier.type != "NODES" or not is_prepare_group(modifier.node_group):
         return False
     return (obj, modifier)
 
 
-def get_evaluated_geometry(obj, context):
-    depsgraph: bpy.types.Depsgraph = context.evaluated_depsgraph_get()
+def is_materialize_root(obj):
+    return not is_materialize_child(obj) and bool(is_materialize_modifier(obj))
+
+
+def get_evaluated_geometry(obj, context_or_depsgraph):
+    """The evaluated geometry of obj. Pass the depsgraph when reading several
+    objects, so it is only fetched once"""
+    depsgraph = context_or_depsgraph
+    if not isinstance(depsgraph, bpy.types.Depsgraph):
+        depsgraph = context_or_depsgraph.evaluated_depsgraph_get()
     object_eval = obj.evaluated_get(depsgraph)
     data = object_eval.evaluated_geometry()
     return data
+
+
+class StageTimer:
+    """Wall-clock time spent in each stage of a materialize run"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def iterate(self, name, iterable):
+        """Yields the items of iterable, timing only the time spent producing
+        them, so lazy stages can be interleaved with the ones consuming them"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def format(self):
+        return ", ".join(
+            f"{name} {duration * 1000:.1f}ms" for name, duration in self.stages.items()
+        )
@@ -0,0 +1,341 @@
+import numpy as np
+from array import array
+from .parsing import (
+    data_block_type_ids,
+    element_decoders,
+    geometry_components,
+    read_id_column,
+    type_ids,
+)
+
+
+def validation_error(message, path):
+    return {"status": "ERROR", "message": message, "path": path}
+
+
+def resolve_path(node):
+    """Paths are kept as (parent node, name) chains while walking, and only
+    turned into lists for the elements that are reported"""
+    path = []
+    while node is not None:
+        node, name = node
+        path.append(name)
+    path.reverse()
+    return path
+
+
+def get_subtyped_type_ids():
+    """Type ids whose elements carry a subtype. Read from element_decoders on
+    every run, so decoders registered after import are included"""
+    return frozenset(
+        type_id
+        for type_id, decoder in element_decoders.items()
+        if decoder.subtypes is not None
+    )
+
+
+class IdTable:
+    """The id columns of the instances of a geometry set. Subtype ids are only
+    read if one of the instances has a type in subtyped_type_ids."""
+
+    __slots__ = ("references", "type_ids", "subtype_ids", "reference_indices")
+
+    def __init__(self, pointcloud, references, subtyped_type_ids):
+        attributes = pointcloud.attributes
+        self.references = references
+        self.reference_indices = read_id_column(attributes, ".reference_index") or []
+        count = len(self.reference_indices)
+        self.type_ids = (read_id_column(attributes, "type") or [0] * count)[:count]
+        self.subtype_ids = None
+        if not subtyped_type_ids.isdisjoint(self.type_ids):
+            subtype_ids = read_id_column(attributes, "subtype")
+            if subtype_ids is not None:
+                self.subtype_ids = subtype_ids[:count]
+
+    def children(self):
+        """(row, type name, child geometry) of every instance whose type id
+        and reference index are valid"""
+        references = self.references
+        for row, [type_id, reference_index] in enumerate(
+            zip(self.type_ids, self.reference_indices)
+        ):
+            type_name = type_ids.get(type_id)
+            if type_name is not None and 0 <= reference_index < len(references):
+                yield row, type_name, references[reference_index]
+
+
+def read_table(geometry, subtyped_type_ids):
+    pointcloud = geometry.instances_pointcloud()
+    references = geometry.instance_references()
+    if pointcloud is None or references is None:
+        return None
+    return IdTable(pointcloud, references, subtyped_type_ids)
+
+
+class ElementColumns:
+    """The id columns of every element table below a root, appended into flat
+    buffers so each check runs once, vectorized, over all of them instead of
+    once per table"""
+
+    def __init__(self):
+        self.paths = []
+        self.table_starts = array("q")
+        self.type_ids = array("q")
+        self.subtype_ids = array("q")
+        self.reference_indices = array("q")
+        self.reference_counts = array("q")
+
+    def add(self, path, type_ids, subtype_ids, reference_indices, reference_count):
+        count = len(reference_indices)
+        self.paths.append(path)
+        self.table_starts.append(len(self.type_ids))
+        self.type_ids.extend(type_ids)
+        if subtype_ids is None:
+            subtype_ids = [-1] * count
+        self.subtype_ids.extend(subtype_ids)
+        self.reference_indices.extend(reference_indices)
+        self.reference_counts.extend([reference_count] * count)
+
+    def count_types(self):
+        """Number of elements by type id"""
+        types = np.frombuffer(self.type_ids, dtype=np.int64)
+        values, counts = np.unique(types, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def check(self, errors):
+        types = np.frombuffer(self.type_ids, dtype=np.int64)
+        subtypes = np.frombuffer(self.subtype_ids, dtype=np.int64)
+        references = np.frombuffer(self.reference_indices, dtype=np.int64)
+        reference_counts = np.frombuffer(self.reference_counts, dtype=np.int64)
+        table_starts = np.frombuffer(self.table_starts, dtype=np.int64)
+
+        def report(mask, message):
+            positions = np.flatnonzero(mask)
+            tables = np.searchsorted(table_starts, positions, side="right") - 1
+            for [position, table] in zip(positions.tolist(), tables.tolist()):
+                path = resolve_path(self.paths[table])
+                path.append(f"instance {position - table_starts[table]}")
+                errors.append(validation_error(message(position), path))
+
+        known = np.isin(types, np.fromiter(type_ids, dtype=np.int64))
+        report(~known, lambda position: f"Unknown element type {types[position]}")
+        for type_id, decoder in element_decoders.items():
+            if decoder.subtypes is None:
+                continue
+            of_type = types == type_id
+            valid = np.isin(subtypes, np.fromiter(decoder.subtypes, dtype=np.int64))
+            report(
+                of_type & (subtypes < 0),
+                lambda _: f"{decoder.type_name.capitalize()} is missing subtype value",
+            )
+            report(
+                of_type & (subtypes >= 0) & ~valid,
+                lambda position: f"Unknown {decoder.type_name.lower()} subtype {subtypes[position]}",
+            )
+        report(
+            (references < 0) | (references >= reference_counts),
+            lambda position: f"Reference index {references[position]} out of range",
+        )
+
+
+def check_parents(errors, parents, names):
+    """Parent indices have to be -1 or point at an earlier object, which also
+    rules out cycles. Cycles are reported as such, found by pointer jumping."""
+    count = len(parents)
+    in_range = (parents >= -1) & (parents < count)
+    ancestors = np.where(in_range, parents, -1)
+    for _ in range(max(count.bit_length(), 1)):
+        ancestors = np.where(ancestors >= 0, ancestors[np.maximum(ancestors, 0)], -1)
+    cyclic = ancestors >= 0
+    later = in_range & ~cyclic & (parents >= np.arange(count))
+    for index in np.flatnonzero(~in_range).tolist():
+        errors.append(
+            validation_error(
+                f"Parent index {parents[index]} out of range", [names[index]]
+            )
+        )
+    for index in np.flatnonzero(cyclic).tolist():
+        errors.append(validation_error("Parent hierarchy is cyclic", [names[index]]))
+    for index in np.flatnonzero(later).tolist():
+        errors.append(
+            validation_error(
+                f"Parent {names[parents[index]]} comes after its child", [names[index]]
+            )
+        )
+
+
+def check_unique_names(errors, names):
+    if len(names) == 0:
+        return
+    unique, counts = np.unique(np.array(names, dtype=object), return_counts=True)
+    for name in unique[counts > 1].tolist():
+        errors.append(validation_error("Duplicate object name", [name]))
+
+
+def check_geometry(errors, subtype, child, path):
+    """Geometry other than armatures has no elements below it, only the
+    component holding its data"""
+    if subtype == "INSTANCE":
+        present = child.instances_pointcloud() is not None
+    else:
+        present = getattr(child, geometry_components[subtype]) is not None
+    if not present:
+        errors.append(
+            validation_error(
+                "Missing expected geometry data", [*resolve_path(path), "geometry"]
+            )
+        )
+
+
+def get_object_name(obj, table):
+    for _, type_name, child in table.children():
+        if type_name == "NAME":
+            return child.name
+    return obj.name
+
+
+class IdTables:
+    """The id columns validate_geometry read, kept for ParseContext so the
+    parser does not read them again. Tables are numbered in the order they
+    were added to ElementColumns and their columns are sliced out of its flat
+    buffers when taken, so little more than the references of each table is
+    kept alive until it is parsed."""
+
+    def __init__(self):
+        self.positions = {}
+        self.geometries = []
+        self.references = []
+        self.subtyped = bytearray()
+        self.table_starts = None
+        self.type_ids = None
+        self.subtype_ids = None
+        self.reference_indices = None
+
+    def keep(self, columns):
+        """Keeps the buffers of columns, but not its paths"""
+        self.table_starts = columns.table_starts
+        self.type_ids = columns.type_ids
+        self.subtype_ids = columns.subtype_ids
+        self.reference_indices = columns.reference_indices
+
+    def add(self, geometry, table):
+        self.positions[id(geometry)] = len(self.geometries)
+        self.geometries.append(geometry)
+        self.references.append(table.references)
+        self.subtyped.append(table.subtype_ids is not None)
+
+    def take(self, geometry):
+        """(references, reference indices, type ids, subtype ids) of geometry
+        as validated, or None. A table can only be taken once."""
+        position = self.positions.pop(id(geometry), None)
+        if position is None or self.geometries[position] is not geometry:
+            return None
+        table_starts = self.table_starts
+        start = table_starts[position]
+        if position + 1 < len(table_starts):
+            end = table_starts[position + 1]
+        else:
+            end = len(self.type_ids)
+        references = self.references[position]
+        self.geometries[position] = None
+        self.references[position] = None
+        subtype_ids = None
+        if self.subtyped[position]:
+            subtype_ids = self.subtype_ids[start:end]
+        return (
+            references,
+            self.reference_indices[start:end],
+            self.type_ids[start:end],
+            subtype_ids,
+        )
+
+
+def validate_geometry(root, type_counts=None, id_tables=None):
+    """Checks the element tables below the evaluated geometry of a materialize
+    root before anything is parsed or created: element type and subtype ids,
+    reference indices, parent indices and object names. Only id columns are
+    read. Returns every problem found as a list of error results, empty if the
+    geometry is valid. If type_counts is given, it is called with the number
+    of elements by type id. If id_tables, an IdTables, is given, the id
+    columns read are kept in it for ParseContext."""
+    subtyped_type_ids = get_subtyped_type_ids()
+    table = read_table(root, subtyped_type_ids)
+    if table is None:
+        return [validation_error("Malformed data", [])]
+    errors = []
+    columns = ElementColumns()
+    object_count = len(table.reference_indices)
+    # Root instances are always parsed as objects, whatever their type id
+    object_type_id = next(k for k, v in type_ids.items() if v == "OBJECT")
+    references = table.references
+    columns.add(
+        None,
+        [object_type_id] * object_count,
+        None,
+        table.reference_indices,
+        len(references),
+    )
+    if id_tables is not None:
+        id_tables.add(root, table)
+
+    names = [f"instance {index}" for index in range(object_count)]
+    stack = []
+    for row, reference_index in enumerate(table.reference_indices):
+        if not 0 <= reference_index < len(references):
+            continue
+        obj = references[reference_index]
+        object_table = read_table(obj, subtyped_type_ids)
+        if object_table is None:
+            names[row] = obj.name
+            errors.append(validation_error("Malformed data", [obj.name]))
+            continue
+        names[row] = get_object_name(obj, object_table)
+        stack.append(((None, obj.name), obj, object_table))
+
+    check_unique_names(errors, names)
+    parents = read_id_column(root.instances_pointcloud().attributes, "parent")
+    if parents is not None:
+        check_parents(errors, np.array(parents[:object_count], dtype=np.int64), names)
+
+    geometry_type_names = ("GEOMETRY", "REFERENCE_GEOMETRY")
+    while len(stack) > 0:
+        path, geometry, table = stack.pop()
+        columns.add(
+            path,
+            table.type_ids,
+            table.subtype_ids,
+            table.reference_indices,
+            len(table.references),
+        )
+        if id_tables is not None:
+            id_tables.add(geometry, table)
+        for row, type_name, child in table.children():
+            if type_name == "NAME":
+                continue
+            child_path = (path, child.name)
+            if type_name in geometry_type_names:
+                subtype = None
+                if table.subtype_ids is not None:
+                    subtype = data_block_type_ids.get(table.subtype_ids[row])
+                if subtype is None:
+                    continue
+                if subtype != "ARMATURE":
+                    check_geometry(errors, subtype, child, child_path)
+                    continue
+            elif type_name == "SELECTION":
+                mesh = child.mesh
+                if mesh is None or "index" not in mesh.attributes:
+                    path_names = resolve_path(child_path)
+                    errors.append(
+                        validation_error("Expected indices", [*path_names, "selection"])
+                    )
+            child_table = read_table(child, subtyped_type_ids)
+            if child_table is not None:
+                stack.append((child_path, child, child_table))
+
+    columns.check(errors)
+    if id_tables is not None:
+        id_tables.keep(columns)
+    if type_counts is not None:
+        type_counts(columns.count_types())
+    return errors
@@ -0,0 +1,101 @@
+import numpy as np
+from .parsing import read_attribute_column
+
+# VertexGroup.add() sets one weight for a list of vertices, so each group is
+# written with one call per distinct weight. Exact float weights are mostly
+# distinct, which costs one call per vertex, so groups with more distinct
+# weights than weight_levels are rounded to as many levels between 0 and 1.
+# The default of 1024 levels keeps the error below 0.0005 and a group at 1024
+# calls at most. Weights are written exactly if weight_levels is None.
+default_weight_levels = 1024
+
+
+class SharedIndices:
+    """Index arrays shared by the vertex groups of one mesh, so groups over all
+    vertices or over the same selection do not build their own copies"""
+
+    def __init__(self, vertex_count):
+        self.vertex_count = vertex_count
+        self.all_vertices = None
+        self.selections = {}
+
+    def get(self, selection):
+        if selection is None:
+            if self.all_vertices is None:
+                self.all_vertices = np.arange(self.vertex_count, dtype=np.int32)
+            return self.all_vertices
+        indices = selection.indices
+        key = indices.tobytes()
+        shared = self.selections.get(key)
+        if shared is None:
+            in_range = (indices >= 0) & (indices < self.vertex_count)
+            shared = indices if in_range.all() else indices[in_range]
+            self.selections[key] = shared
+        return shared
+
+
+def read_weights(mesh, name):
+    """The float weights a vertex group is given by, a point attribute of the
+    same name, or None if the group has uniform weight"""
+    attribute = mesh.attributes.get(name)
+    if attribute is None or attribute.domain != "POINT":
+        return None
+    if attribute.data_type != "FLOAT":
+        return None
+    return np.asarray(read_attribute_column(attribute), dtype=np.float32).reshape(-1)
+
+
+def group_by_weight(indices, weights, weight_levels=None):
+    """Splits indices into one array per distinct weight. Zero weights are
+    dropped, vertices that are not in a group do not need an entry. Weights
+    are rounded to weight_levels levels if there are more distinct ones."""
+    nonzero = weights != 0.0
+    if not nonzero.all():
+        indices = indices[nonzero]
+        weights = weights[nonzero]
+    values, inverse = np.unique(weights, return_inverse=True)
+    if weight_levels is not None and len(values) > weight_levels:
+        weights = np.round(weights * weight_levels) / weight_levels
+        nonzero = weights != 0.0
+        indices = indices[nonzero]
+        values, inverse = np.unique(weights[nonzero], return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(values)))[:-1]
+    return values.tolist(), np.split(indices[order], bounds)
+
+
+def assign_vertex_groups(
+    obj, mesh, vertex_groups, weight_levels=default_weight_levels
+):
+    """Replaces the vertex groups of obj with the parsed VERTEX_GROUP records.
+
+    Weights come from the point attribute named after each group. The
+    attributes are removed from the mesh once read, vertex groups and
+    attributes cannot share names. Weights are rounded to weight_levels
+    levels, or written exactly if it is None, see group_by_weight."""
+    obj.vertex_groups.clear()
+    if not vertex_groups:
+        return
+    shared = SharedIndices(len(mesh.vertices))
+    groups = []
+    for record in vertex_groups:
+        name = record.name or "Group"
+        indices = shared.get(record.selection)
+        weights = read_weights(mesh, name)
+        if weights is not None:
+            weights = weights[indices]
+        groups.append((name, indices, weights))
+    for name, _, _ in groups:
+        attribute = mesh.attributes.get(name)
+        if attribute is not None:
+            mesh.attributes.remove(attribute)
+    for name, indices, weights in groups:
+        vertex_group = obj.vertex_groups.new(name=name)
+        if weights is None:
+            if len(indices) > 0:
+                vertex_group.add(indices.tolist(), 1.0, "REPLACE")
+            continue
+        for weight, weight_indices in zip(
+            *group_by_weight(indices, weights, weight_levels)
+        ):
+            vertex_group.add(weight_indices.tolist(), weight, "REPLACE")